@@ -1,13 +1,16 @@
 # aging_queue_manager.py
 
-import json
+import heapq
+import itertools
 import os
 import threading
 from datetime import datetime
 
-import fauxjson as _json
 import fauxlogger as _log
 from config import Config
+from episode_table import EpisodeTable
+from history_store import record_history
+from queue_store import IndexedQueue, get_store
 from schema import WAIConfigRoot
 
 CONFIG_FILE: str = os.getenv("WAI_CONFIG_FILE", "./conf/wai.toml")
@@ -16,36 +19,68 @@ config: Config[WAIConfigRoot] = Config(
 )
 
 
-AGING_QUEUE_FILE = os.path.join(config.data.wai.data_dir, config.data.aging_queue.file)
+AGING_QUEUE = "aging"
+AGING_CURRENT = "aging.current"
 
 
 aging_queue_lock = threading.Lock()
 aging_queue_condition = threading.Condition(lock=aging_queue_lock)
-aging_queue = []
-aging_item = None
+aging_queue = IndexedQueue()
+# Min-heap of (next_aging, tiebreak, item id). Entries for items that were
+# removed or rescheduled are left in place and skipped when they surface.
+aging_schedule: list[tuple[int, int, str]] = []
+aging_schedule_seq = itertools.count()
+aging_items: list[dict] = []
 
 
 def load_aging_queue():
-    global aging_queue
-    aging_queue = []
-    if os.path.exists(AGING_QUEUE_FILE):
-        with open(AGING_QUEUE_FILE, "r") as f:
-            try:
-                data = json.load(f)
-                if isinstance(data, list):
-                    aging_queue.extend(data)
-            except json.JSONDecodeError:
-                _log.msg(
-                    "Failed to decode queue JSON; starting with empty aging queue."
-                )
+    global aging_queue, aging_schedule
+    aging_queue = IndexedQueue(get_store().load(AGING_QUEUE))
+    aging_schedule = [
+        (n_item.get("next_aging", 0), next(aging_schedule_seq), str(n_item["id"]))
+        for n_item in aging_queue
+    ]
+    heapq.heapify(aging_schedule)
+
+
+def pop_due_aging_items(now: int) -> tuple[list[dict], int | None]:
+    """Pop every item that is due, most overdue first.
+
+    Returns the items (possibly none) and the number of seconds until the
+    next scheduled item is due (or None if nothing is scheduled). Caller must
+    hold ``aging_queue_condition``.
+    """
+    _items = []
+
+    while aging_schedule:
+        _due, _, _id = aging_schedule[0]
+        _item = aging_queue.get(_id)
+
+        if _item is None or _item.get("next_aging", 0) != _due:
+            heapq.heappop(aging_schedule)
+            continue
+
+        if _due > now:
+            return _items, None if _items else _due - now
+
+        heapq.heappop(aging_schedule)
+        _items.append(aging_queue.remove(_id))
+
+    return _items, None
+
 
+def group_by_series(items: list[dict]) -> dict[int | None, list[dict]]:
+    """Items keyed by matched series, in the order each series first appears."""
+    _groups: dict[int | None, list[dict]] = {}
+    for _item in items:
+        _series_id = (_item.get("title_result") or {}).get("matched_id")
+        _groups.setdefault(_series_id, []).append(_item)
 
-def save_aging_queue():
-    with open(AGING_QUEUE_FILE, "w") as f:
-        json.dump(aging_queue, f, indent=2)
+    return _groups
 
 
-def aging_enqueue(aging_item: dict) -> None:
+def aging_enqueue(aging_item: dict, source: str | None = None) -> None:
+    """Schedule ``aging_item``, moving it out of queue ``source`` if given."""
     from util import get_new_ripeness, get_next_aging_time
 
     if aging_item.get("ripeness", -1) == -1:
@@ -53,36 +88,88 @@ def aging_enqueue(aging_item: dict) -> None:
         aging_item["next_aging"] = get_next_aging_time(aging_item)
 
     with aging_queue_condition:
+        if source is None:
+            get_store().put(aging_item, AGING_QUEUE)
+        else:
+            get_store().move(aging_item, source, AGING_QUEUE)
         aging_queue.append(aging_item)
-        save_aging_queue()
-        aging_queue_condition.notify()  # does this cause immediate action?
+        heapq.heappush(
+            aging_schedule,
+            (
+                aging_item.get("next_aging", 0),
+                next(aging_schedule_seq),
+                str(aging_item["id"]),
+            ),
+        )
+        # Wake the worker so it can shorten its sleep if this item is due sooner.
+        aging_queue_condition.notify()
 
     return None
 
 
+def wake_series(series_id: int) -> int:
+    """Make every aging item matched to ``series_id`` due now, for a recheck."""
+    now = int(datetime.now().timestamp())
+    _woken = 0
+
+    with aging_queue_condition:
+        for _item in aging_queue:
+            if (_item.get("title_result") or {}).get("matched_id") != series_id:
+                continue
+            if _item.get("next_aging", 0) <= now:
+                continue
+
+            _item.setdefault("woken_from", _item["next_aging"])
+            _item["next_aging"] = now
+            get_store().put(_item, AGING_QUEUE)
+            heapq.heappush(
+                aging_schedule, (now, next(aging_schedule_seq), str(_item["id"]))
+            )
+            _woken += 1
+
+        if _woken:
+            aging_queue_condition.notify()
+
+    return _woken
+
+
+def dequeue(aging_item: dict | str) -> bool:
+    _id = aging_item if isinstance(aging_item, str) else str(aging_item.get("id", ""))
+
+    with aging_queue_condition:
+        q_item = aging_queue.remove(_id)
+        if q_item is None:
+            return False
+
+        get_store().remove(q_item, AGING_QUEUE)
+        return True
+
+
 def close_aging_item(
     aging_item: dict,
     message: str,
     filename: str | None,
     stack_offset: int = 2,
-    subdir: str = "",
 ) -> None:
     # if config.data.debug and  config.data.debug.debug_break:
     #     breakpoint()
     _log.msg(message, stack_offset)
     if filename:
-        _json.save_json(aging_item, filename, subdir=subdir)
-    _json.delete_json_file("current_aging.json")
+        record_history(aging_item, filename)
+    get_store().remove(aging_item, AGING_CURRENT)
 
     return None
 
 
-def recheck_episode_match(item: dict) -> dict | None:
-    from cfsonarr import get_episode_data_for_shows
+def recheck_episode_match(
+    item: dict, table: EpisodeTable | None = None
+) -> dict | None:
     from cfsonarrmatcher import match_to_episode
+    from episode_table import to_plain
+    from sonarr_cache import get_episode_data
 
-    show_data = get_episode_data_for_shows(
-        item["title_result"].get("matched_show"), item["title_result"].get("matched_id")
+    show_data = get_episode_data(
+        item["title_result"].get("matched_id"), None, item.get("datecode"), table
     )
     main_title = f"{item.get('creator', '')} :: {item.get('title', '')}"
     episode_result = match_to_episode(
@@ -96,46 +183,53 @@ def recheck_episode_match(item: dict) -> dict | None:
     if episode_result["score"] < 70:
         return None
 
-    item["episode_result"] = episode_result
+    item["episode_result"] = to_plain(episode_result)
 
     return item
 
 
-def process_aging_item(aging_item: dict) -> tuple[bool, dict | None]:
-    from cfsonarr import refresh_series
+def process_aging_item(
+    aging_item: dict, table: EpisodeTable | None = None
+) -> tuple[bool, dict | None]:
     from decision_queue_manager import enqueue as enqueue_decision
     from manual_intervention_manager import enqueue as mi_enqueue
+    from refresh_scheduler import request_refresh
     from util import get_new_ripeness, get_next_aging_time
 
     if aging_item.get("ripeness", -1) == -1:
         aging_item["ripeness"] = get_new_ripeness(aging_item)
 
+    # Set when a finished Sonarr refresh pulled this item forward.
+    _woken_from = aging_item.pop("woken_from", None)
+
     if aging_item["ripeness"] < config.data.aging_queue.ripeness_per_day * 3:
-        checked_item = recheck_episode_match(aging_item)
+        checked_item = recheck_episode_match(aging_item, table)
 
         if checked_item:
-            enqueue_decision(checked_item)
+            enqueue_decision(checked_item, source=AGING_CURRENT)
             return True, close_aging_item(
                 aging_item,
                 f"{_log._BLUE}Episode candidate found.{_log._RESET} Returning item to main queue.",
                 "requeued.json",
-                subdir="history",
             )
         else:
             now = int(datetime.now().timestamp())
 
-            if now > aging_item["next_aging"]:
+            if _woken_from is not None:
+                # An early recheck doesn't count as an aging step.
+                aging_item["next_aging"] = _woken_from
+            elif now >= aging_item["next_aging"]:
                 aging_item["last_scan"] = now
 
-                refresh_series(aging_item["title_result"]["matched_id"])
+                _requested = request_refresh(aging_item["title_result"]["matched_id"])
                 aging_item["ripeness"] += 1
                 aging_item["next_aging"] = get_next_aging_time(aging_item)
-                _ = close_aging_item(
-                    aging_item,
-                    "Requesting Sonarr refresh for '"
+                # Stays checkpointed until process_queue moves it back to aging.
+                _log.msg(
+                    ("Requesting" if _requested else "Awaiting")
+                    + " Sonarr refresh for '"
                     f"{_log._YELLOW}{aging_item["title_result"]["matched_show"]}{_log._RESET}"
-                    "' and returning to aging queue.",
-                    None,
+                    "' and returning to aging queue."
                 )
 
             return False, aging_item
@@ -144,70 +238,65 @@ def process_aging_item(aging_item: dict) -> tuple[bool, dict | None]:
         _log.msg(
             f"Ripeness {aging_item["ripeness"]}: Item should be old enough for data."
         )
-        mi_enqueue(aging_item)
+        mi_enqueue(aging_item, source=AGING_CURRENT)
 
         return False, None
 
 
 def process_queue(stop_event: threading.Event):
-    global aging_item
+    from sonarr_cache import get_episode_table
 
-    if aging_item is None:
-        aging_item = _json.load_json("current_aging.json")
-    if aging_queue == []:
+    global aging_items
+
+    if not aging_items:
+        aging_items = get_store().load(AGING_CURRENT)
+    if not aging_queue:
         load_aging_queue()
 
     while not stop_event.is_set():
         with aging_queue_condition:
-            while not aging_item and not aging_queue and not stop_event.is_set():
-                if config.data.debug and config.data.debug.debug_print is True:
-                    _log.msg(
-                        f"No current aging item. No aging queue. Sleeping for at most {config.data.aging_queue.interval} min."
-                    )
-                aging_queue_condition.wait(
-                    timeout=config.data.aging_queue.interval * 60
-                )
-
-            if not aging_item and aging_queue:
+            while not aging_items and not stop_event.is_set():
                 now = int(datetime.now().timestamp())
-                eligible_aging_items = [
-                    n_item
-                    for n_item in aging_queue
-                    if n_item.get("next_aging", 0) <= now
-                ]
-                if eligible_aging_items:
-                    # Sort by next_aging to pick the most overdue item
+                aging_items, _delay = pop_due_aging_items(now)
+                if aging_items:
+                    for _item in aging_items:
+                        get_store().move(_item, AGING_QUEUE, AGING_CURRENT)
+                    break
+
+                if _delay is None:
+                    _delay = config.data.aging_queue.interval * 60
                     if config.data.debug and config.data.debug.debug_print is True:
-                        _log.msg("Sorting eligible items..")
-                    eligible_aging_items.sort(
-                        key=lambda item: item.get("next_aging", 0)
-                    )
-                    aging_item = eligible_aging_items[0]
-                    aging_queue.remove(aging_item)
-                    _json.save_json(aging_item, "current_aging.json", True)
-                    save_aging_queue()
+                        _log.msg(
+                            f"No current aging item. No aging queue. Sleeping for at most {config.data.aging_queue.interval} min."
+                        )
                 elif config.data.debug and config.data.debug.debug_print is True:
-                    _log.msg("Queue present but no eligible items.")
+                    _log.msg(f"Next aging item due in {_delay} sec.")
 
-        if aging_item:
+                aging_queue_condition.wait(timeout=_delay)
 
-            _log.msg(
-                f"Processing aging item:\n"
-                f"{_log._BLUE}Creator:{_log._RESET} {aging_item.get("creator")}\n"
-                f"{_log._BLUE}Title:{_log._RESET} {aging_item.get("title")}"
-            )
+        # Recheck due items series by series, against one fetch of each
+        # series' episodes.
+        for _series_id, _group in group_by_series(aging_items).items():
+            if stop_event.is_set():
+                # Unprocessed items stay in the checkpoint and resume on restart.
+                break
+
+            _table = get_episode_table(_series_id) if _series_id is not None else None
+            if len(_group) > 1:
+                _log.msg(
+                    f"Rechecking {len(_group)} aging items for series {_series_id}."
+                )
 
-            wait_before_loop, aging_item = process_aging_item(aging_item)
+            for aging_item in _group:
+                _log.msg(
+                    f"Processing aging item:\n"
+                    f"{_log._BLUE}Creator:{_log._RESET} {aging_item.get("creator")}\n"
+                    f"{_log._BLUE}Title:{_log._RESET} {aging_item.get("title")}"
+                )
 
-            if aging_item:
-                aging_item = aging_enqueue(aging_item)
+                _, aging_item = process_aging_item(aging_item, _table)
 
-            if not wait_before_loop:
-                continue
+                if aging_item:
+                    aging_enqueue(aging_item, source=AGING_CURRENT)
 
-        if config.data.debug and config.data.debug.debug_print is True:
-            _log.msg(
-                f"Aging queue thread sleeping for {config.data.aging_queue.interval} min."
-            )
-        with aging_queue_condition:
-            aging_queue_condition.wait(timeout=config.data.aging_queue.interval * 60)
+        aging_items = []
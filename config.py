@@ -118,7 +118,10 @@ class Config(Generic[T]):
                 value = data.get(field.name)
 
                 if value is None:
-                    kwargs[field.name] = None
+                    if field.default_factory is not dataclasses.MISSING:
+                        kwargs[field.name] = field.default_factory()
+                    else:
+                        kwargs[field.name] = None
                     continue
 
                 if isinstance(value, dict):
@@ -0,0 +1,84 @@
+# creator_affinity.py
+
+import json
+import os
+import threading
+import time
+from typing import Final
+
+import fauxlogger as _log
+from config import Config
+from schema import WAIConfigRoot
+
+CONFIG_FILE: str = os.getenv("WAI_CONFIG_FILE", "./conf/wai.toml")
+config: Config[WAIConfigRoot] = Config(
+    schema=WAIConfigRoot, path=CONFIG_FILE, env_prefix="WAI_"
+)
+
+AFFINITY_FILE: Final[str] = os.path.join(
+    config.data.wai.data_dir, config.data.wai.affinity_file
+)
+
+# Lowercased creator -> {"series_id", "series", "imports", "updated"}
+creator_affinity: dict[str, dict] = {}
+creator_affinity_loaded = False
+creator_affinity_lock = threading.Lock()
+
+
+def load_affinity():
+    global creator_affinity_loaded
+
+    if os.path.exists(AFFINITY_FILE):
+        with open(AFFINITY_FILE, "r") as f:
+            try:
+                data = json.load(f)
+                if isinstance(data, dict):
+                    creator_affinity.clear()
+                    creator_affinity.update(data)
+            except json.JSONDecodeError:
+                _log.msg(
+                    "Failed to decode affinity JSON; starting with no affinities."
+                )
+
+    creator_affinity_loaded = True
+
+
+def save_affinity():
+    tmp_file = f"{AFFINITY_FILE}.tmp"
+    with open(tmp_file, "w") as f:
+        json.dump(creator_affinity, f, indent=2)
+    os.replace(tmp_file, AFFINITY_FILE)
+
+
+def get_affinity(creator: str) -> dict | None:
+    """The series ``creator``'s items were last imported into, if any."""
+    with creator_affinity_lock:
+        if not creator_affinity_loaded:
+            load_affinity()
+        return creator_affinity.get(creator.lower())
+
+
+def record_affinity(item: dict) -> None:
+    """Remember the series an imported item went into, for its creator."""
+    _creator = str(item.get("creator", "")).lower()
+    _episode_result = item.get("episode_result") or {}
+    _series_id = _episode_result.get("matched_series_id")
+
+    if not _creator or _series_id is None:
+        return
+
+    with creator_affinity_lock:
+        if not creator_affinity_loaded:
+            load_affinity()
+
+        _entry = creator_affinity.get(_creator)
+        if _entry is None or _entry.get("series_id") != _series_id:
+            _entry = {"series_id": _series_id, "imports": 0}
+        _entry["series"] = _episode_result.get(
+            "matched_show", _entry.get("series", "")
+        )
+        _entry["imports"] += 1
+        _entry["updated"] = int(time.time())
+        creator_affinity[_creator] = _entry
+
+        save_affinity()
@@ -1,17 +1,11 @@
 # decision_queue_manager.py
 
-import errno
-import json
 import os
-import shutil
-import sys
 import threading
-import uuid
 
-import fauxjson as _json
 import fauxlogger as _log
 from config import Config
-from fauxcache import timed_cache
+from queue_store import StageQueue
 from schema import WAIConfigRoot
 
 CONFIG_FILE: str = os.getenv("WAI_CONFIG_FILE", "./conf/wai.toml")
@@ -19,51 +13,27 @@ config: Config[WAIConfigRoot] = Config(
     schema=WAIConfigRoot, path=CONFIG_FILE, env_prefix="WAI_"
 )
 
-DECISION_QUEUE_FILE = os.path.join(
-    config.data.wai.data_dir, config.data.decision_queue.file
-)
-
-decision_queue_lock = threading.Lock()
-decision_queue_condition = threading.Condition(lock=decision_queue_lock)
-decision_queue = []
-item = None
-
-
-def load_decision_queue():
-    global decision_queue
-    decision_queue = []
-    if os.path.exists(DECISION_QUEUE_FILE):
-        with open(DECISION_QUEUE_FILE, "r") as f:
-            try:
-                data = json.load(f)
-                if isinstance(data, list):
-                    decision_queue.extend(data)
-            except json.JSONDecodeError:
-                _log.msg("Failed to decode queue JSON; starting with empty queue.")
+DECISION_QUEUE = "decision"
 
-
-def save_decision_queue():
-    with open(DECISION_QUEUE_FILE, "w") as f:
-        json.dump(decision_queue, f, indent=2)
+decision_stage = StageQueue(
+    DECISION_QUEUE,
+    lambda: config.data.decision_queue,
+    lambda: config.data.decision_queue.matcher_threads,
+    lambda: config.data.decision_queue.batch_size,
+    taken_history="all_processed.json",
+)
 
 
-def enqueue(item: dict):
-    with decision_queue_condition:
-        decision_queue.append(item)
-        save_decision_queue()
-        # queue_condition.notify()
-        # TODO : Instead of bypass, wake queue if last queue action time was sufficiently distant
+def enqueue(item: dict, durable: bool = False, source: str | None = None):
+    _committed = decision_stage.enqueue(item, source)
 
+    if durable:
+        # Raises if the write was not committed.
+        _committed.result()
 
-def dequeue(item: dict) -> bool:
-    with decision_queue_condition:
-        for i, q_item in enumerate(decision_queue):
-            if q_item == item:
-                del decision_queue[i]
-                save_decision_queue()
 
-                return True
-        return False
+def dequeue(item: dict | str) -> bool:
+    return decision_stage.dequeue(item)
 
 
 def close_item(
@@ -71,14 +41,8 @@ def close_item(
     message: str,
     filename: str | None,
     stack_offset: int = 2,
-    subdir: str = "",
 ) -> dict | None:
-    if config.data.debug and config.data.debug.debug_break:
-        breakpoint()
-    _log.msg(message, stack_offset)
-    if filename:
-        _json.save_json(item, filename, subdir=subdir)
-    _json.delete_json_file("current_decision.json")
+    decision_stage.close(item, message, filename, stack_offset)
 
     return None
 
@@ -90,9 +54,8 @@ def diagnose_show_score(item: dict) -> dict | None:
 
     return close_item(
         item,
-        f"Series match score not high enough. ({item["title_result"]["score"]} < 70)  Aborting.",
+        f"Series match score not high enough. ({(item.get("title_result") or {}).get("score", 0)} < 70)  Aborting.",
         "series_score.json",
-        subdir="history",
     )
 
 
@@ -114,141 +77,141 @@ def diagnose_episode_score(item: dict) -> dict | None:
         breakpoint()
 
     if ripeness < config.data.aging_queue.ripeness_per_day * 3:
-        aging_enqueue(item)
+        aging_enqueue(item, source=decision_stage.checkpoint())
         return close_item(item, f"Ripeness {ripeness}: Requeue to aging queue", None)
 
     else:
         _log.msg(f"Ripeness {ripeness}: Item should be old enough for data")
 
-    mi_enqueue(item)
+    mi_enqueue(item, source=decision_stage.checkpoint())
     return close_item(
         item,
         "Moved to manual intervention queue.",
         "manual_intervention.json",
-        subdir="history",
     )
 
 
-def match_and_check(item: dict) -> dict | None:
-    from cfsonarrmatcher import match_to_episode, match_to_show
-    from pyarr import SonarrAPI
+def batch_show_candidates(items: list[dict]) -> list[list[tuple[str, int]]]:
+    """Series shortlists for a whole batch, scored as one rapidfuzz matrix.
 
-    sonarr = SonarrAPI(config.data.sonarr.url, config.data.sonarr.api)
+    Only worth calling with ``decision_queue.title_shortlist`` > 0; without a
+    shortlist every item is handed the whole library and nothing is scored.
+    """
+    from sonarr_cache import get_series_index
 
-    _log.msg(
-        f"Processing item:\n"
-        f"\t{_log._GREEN}creator:{_log._RESET} {item.get('creator', '')}"
-        f"\t{_log._GREEN}title:{_log._RESET} {item.get('title', '')}\n"
-        f"\t{_log._GREEN}datecode:{_log._RESET} {item.get('datecode', '')}"
-        f"\t{_log._GREEN}url:{_log._RESET} {item.get('url', '')}"
+    return get_series_index().candidates_many(
+        [f"{_item.get('creator', '')} :: {_item.get('title', '')}" for _item in items],
+        config.data.decision_queue.title_shortlist,
     )
 
-    show_titles = []
-    id_is_monitored = {}
 
-    for _s in timed_cache(ttl=config.data.decision_queue.cache_ttl)(
-        sonarr.get_series
-    )():
-        show_titles.append((_s["title"], _s["id"]))
-        id_is_monitored[_s["id"]] = _s["monitored"]
+def match_item(
+    item: dict,
+    show_candidates: list[tuple[str, int]] | None = None,
+    use_affinity: bool = True,
+) -> list[int]:
+    """Match ``item`` to a show, then an episode, against the current Sonarr data.
+
+    A creator with a known series affinity skips show matching, unless that
+    series then yields a poor episode score. Sets ``title_result`` (and
+    ``episode_result`` when any candidate series was found) on the item and
+    returns the candidate series IDs.
+    """
+    from cfsonarrmatcher import match_to_episode, match_to_show
+    from creator_affinity import get_affinity
+    from episode_table import to_plain
+    from sonarr_cache import (
+        get_creator_series,
+        get_episode_data,
+        get_series_by_id,
+        get_series_index,
+    )
 
     candidate_series_ids = []
     matched_id = 0
 
     main_title = f"{item.get('creator', '')} :: {item.get('title', '')}"
 
-    title_result = match_to_show(main_title, show_titles)
-    if len(title_result["best_results"]) == 0:
-        _log.msg(f"Series title {_log._RED}did not match.{_log._RESET}")
-    elif len(title_result["best_results"]) == 1:
-        title_result = title_result["best_results"][0]
+    _affinity = get_affinity(item.get("creator", "")) if use_affinity else None
+    if _affinity and not get_series_by_id(_affinity["series_id"]):
+        _affinity = None
+
+    if _affinity:
+        title_result = {
+            "matched_show": _affinity.get("series", ""),
+            "matched_id": _affinity["series_id"],
+            "score": 100,
+            "reason": "creator affinity",
+        }
         item["title_result"] = title_result
         _log.msg(
-            f"Match result: title -> show\n"
-            f"\t{_log._YELLOW}input:{_log._RESET} '{main_title}'\n"
-            f"\t{_log._BLUE if title_result.get('score', 0) >= 70 else _log._RED}score:{_log._RESET} {title_result.get('score', 0)}"
-            f"\t{_log._GREEN}matched show:{_log._RESET} '{title_result.get('matched_show')}'"
-            f" {_log._YELLOW}(id:{title_result.get('matched_id')}){_log._RESET}\n"
-            f"\t{_log._YELLOW}reasons:{_log._RESET} {title_result.get('reason', '')}"
+            f"Creator affinity: trying '{title_result['matched_show']}'"
+            f" {_log._YELLOW}(id:{title_result['matched_id']}){_log._RESET} first."
         )
+        candidate_series_ids.append(title_result["matched_id"])
+        matched_id = title_result["matched_id"]
+    else:
+        if show_candidates is None:
+            show_candidates = get_series_index().candidates(
+                main_title, config.data.decision_queue.title_shortlist
+            )
+
+        title_result = match_to_show(main_title, show_candidates)
+        if len(title_result["best_results"]) == 0:
+            _log.msg(f"Series title {_log._RED}did not match.{_log._RESET}")
+        elif len(title_result["best_results"]) == 1:
+            title_result = title_result["best_results"][0]
+            item["title_result"] = title_result
+            _log.msg(
+                f"Match result: title -> show\n"
+                f"\t{_log._YELLOW}input:{_log._RESET} '{main_title}'\n"
+                f"\t{_log._BLUE if title_result.get('score', 0) >= 70 else _log._RED}score:{_log._RESET} {title_result.get('score', 0)}"
+                f"\t{_log._GREEN}matched show:{_log._RESET} '{title_result.get('matched_show')}'"
+                f" {_log._YELLOW}(id:{title_result.get('matched_id')}){_log._RESET}\n"
+                f"\t{_log._YELLOW}reasons:{_log._RESET} {title_result.get('reason', '')}"
+            )
 
-        if title_result["score"] >= 80:
-            candidate_series_ids.append(title_result["matched_id"])
-            matched_id = title_result.get("matched_id")
+            if title_result["score"] >= 80:
+                candidate_series_ids.append(title_result["matched_id"])
+                matched_id = title_result.get("matched_id")
+            else:
+                _log.msg(
+                    f"Series title match {_log._RED}not good enough.{_log._RESET}"
+                )
         else:
-            _log.msg(f"Series title match {_log._RED}not good enough.{_log._RESET}")
-    else:
-        raise RuntimeError()
+            raise RuntimeError()
 
-    sonarr_relevant_tags = [
-        timed_cache(ttl=config.data.decision_queue.cache_ttl)(sonarr.get_tag_detail)(
-            _tag.get("id")
-        )
-        for _tag in timed_cache(ttl=config.data.decision_queue.cache_ttl)(
-            sonarr.get_tag
-        )()
-        if _tag.get("label").startswith("wai-")
-    ]
-    sonarr_relevant_tags = {
-        _tag["label"].removeprefix("wai-"): _tag["seriesIds"]
-        for _tag in sonarr_relevant_tags
-        if _tag["label"] == f"wai-{item.get("creator", "").lower()}"
-    }
+    _creator = item.get("creator", "").lower()
+    sonarr_relevant_tags = {}
+    if _tagged_series := get_creator_series(_creator):
+        sonarr_relevant_tags[_creator] = _tagged_series
 
     for series_ids in sonarr_relevant_tags.values():
         for series_id in series_ids:
             if not config.data.decision_queue.honor_unmon_series or (
                 config.data.decision_queue.honor_unmon_series
-                and id_is_monitored.get(title_result["matched_id"])
+                and get_series_by_id(title_result["matched_id"]).get("monitored")
             ):
                 if series_id != matched_id:
                     _log.msg(f"Add candidate series ID by tag: {series_id}")
                     candidate_series_ids.append(series_id)
 
     if len(candidate_series_ids) < 1:
-        return diagnose_show_score(item)
+        return candidate_series_ids
 
     show_data = []
     episode_result = {}
 
     for candidate_series_id in candidate_series_ids:
-        _series_name = timed_cache(ttl=config.data.decision_queue.cache_ttl)(
-            sonarr.get_series
-        )(candidate_series_id, {}).get("title", "")
+        _series_name = get_series_by_id(candidate_series_id).get("title", "")
         _log.msg(
             f"Scan episodes of candidate series: {candidate_series_id} ({_series_name})"
         )
-
-        for _ep in timed_cache(ttl=config.data.decision_queue.cache_ttl)(
-            sonarr.get_episode
-        )(candidate_series_id, True):
-            if config.data.decision_queue.honor_unmon_eps and not _ep["monitored"]:
-                continue
-
-            _ep["series"] = _series_name
-            _tag = next(
-                (
-                    __key
-                    for __key, __value in sonarr_relevant_tags.items()
-                    if _ep["seriesId"] in __value
-                ),
-                None,
-            )
-
-            show_data.append(
-                {
-                    "has_file": _ep["hasFile"],
-                    "series": _ep["series"],
-                    "series_id": _ep["seriesId"],
-                    "season": _ep["seasonNumber"],
-                    "episode": _ep["episodeNumber"],
-                    "episode_id": _ep["id"],
-                    "tag": _tag,
-                    "title": _ep["title"],
-                    "air_date": _ep.get("airDate", ""),
-                    "air_date_utc": _ep.get("airDateUtc", ""),
-                }
+        show_data.extend(
+            get_episode_data(
+                candidate_series_id, sonarr_relevant_tags, item.get("datecode")
             )
+        )
 
     episode_result = match_to_episode(
         main_title,
@@ -257,6 +220,7 @@ def match_and_check(item: dict) -> dict | None:
         None,
         title_result.get("matched_show", ""),
     )
+    episode_result = to_plain(episode_result)
     item["episode_result"] = episode_result
     _log.msg(
         f"Match result: title -> episode:\n"
@@ -269,6 +233,82 @@ def match_and_check(item: dict) -> dict | None:
         f"\t{_log._YELLOW}reasons:{_log._RESET} {episode_result.get('reason', '')}"
     )
 
+    if (
+        _affinity
+        and episode_result.get("score", 0)
+        < config.data.decision_queue.affinity_min_score
+    ):
+        _log.msg("Affinity series scored low; matching against the whole library.")
+        # Don't let the affinity guess stand in for a failed full match.
+        item.pop("title_result", None)
+        item.pop("episode_result", None)
+        return match_item(item, show_candidates, use_affinity=False)
+
+    return candidate_series_ids
+
+
+def match_and_check(
+    item: dict, show_candidates: list[tuple[str, int]] | None = None
+) -> dict | None:
+    import copy
+
+    from match_memo import (
+        forget_unmatched_creator,
+        is_unmatched_creator,
+        lookup_match,
+        remember_match,
+        remember_unmatched_creator,
+    )
+
+    _log.msg(
+        f"Processing item:\n"
+        f"\t{_log._GREEN}creator:{_log._RESET} {item.get('creator', '')}"
+        f"\t{_log._GREEN}title:{_log._RESET} {item.get('title', '')}\n"
+        f"\t{_log._GREEN}datecode:{_log._RESET} {item.get('datecode', '')}"
+        f"\t{_log._GREEN}url:{_log._RESET} {item.get('url', '')}"
+    )
+
+    _creator = item.get("creator", "")
+    # A Telegram /set override applies to this match only.
+    _override = item.pop("match_override", False)
+    _negative_cache = config.data.decision_queue.negative_cache and not _override
+
+    if _negative_cache and is_unmatched_creator(_creator):
+        return close_item(
+            item,
+            f"Creator '{_creator}' matched no series for its last"
+            f" {config.data.decision_queue.negative_cache_misses} items and Sonarr"
+            " has not changed since. Aborting.",
+            "series_score.json",
+        )
+
+    # Manual overrides from Telegram /set always get a fresh match.
+    _memo = None if _override else lookup_match(item)
+
+    if _memo is not None:
+        _log.msg("Sonarr data unchanged since last match; reusing its result.")
+        if _memo.title_result is not None:
+            item["title_result"] = copy.deepcopy(_memo.title_result)
+        if _memo.episode_result is not None:
+            item["episode_result"] = copy.deepcopy(_memo.episode_result)
+        candidate_series_ids = list(_memo.series_ids)
+    else:
+        candidate_series_ids = match_item(item, show_candidates)
+        remember_match(
+            item,
+            item.get("title_result"),
+            item.get("episode_result") if candidate_series_ids else None,
+            candidate_series_ids,
+        )
+
+    if len(candidate_series_ids) < 1:
+        if _negative_cache:
+            remember_unmatched_creator(_creator)
+        return diagnose_show_score(item)
+
+    forget_unmatched_creator(_creator)
+    episode_result = item["episode_result"]
+
     if (
         config.data.debug
         and config.data.debug.debug_safe
@@ -299,126 +339,20 @@ def match_and_check(item: dict) -> dict | None:
             item,
             "Episode already has file. Aborting.",
             "episode_has_file.json",
-            subdir="history",
-        )
-
-    return item
-
-
-def safe_move(src, dst):
-    """Rename a file from ``src`` to ``dst``.
-
-    *   Moves must be atomic.  ``shutil.move()`` is not atomic.
-        Note that multiple threads may try to write to the cache at once,
-        so atomicity is required to ensure the serving on one thread doesn't
-        pick up a partially saved image from another thread.
-
-    *   Moves must work across filesystems.  Often temp directories and the
-        cache directories live on different filesystems.  ``os.rename()`` can
-        throw errors if run across filesystems.
-
-    So we try ``os.rename()``, but if we detect a cross-filesystem copy, we
-    switch to ``shutil.move()`` with some wrappers to make it atomic.
-    """
-    try:
-        os.rename(src, dst)
-    except OSError as err:
-
-        if err.errno == errno.EXDEV:
-            # Generate a unique ID, and copy `<src>` to the target directory
-            # with a temporary name `<dst>.<ID>.tmp`.  Because we're copying
-            # across a filesystem boundary, this initial copy may not be
-            # atomic.  We intersperse a random UUID so if different processes
-            # are copying into `<dst>`, they don't overlap in their tmp copies.
-            copy_id = uuid.uuid4()
-            tmp_dst = "%s.%s.tmp" % (dst, copy_id)
-            shutil.copyfile(src, tmp_dst)
-
-            # Then do an atomic rename onto the new name, and clean up the
-            # source image.
-            os.rename(tmp_dst, dst)
-            os.unlink(src)
-        else:
-            raise
-
-
-def download_item(item: dict) -> dict | None:
-    from ytdlp_interface import download_video
-
-    download_filename = download_video(
-        item.get("url", ""), config.data.wai.temp_path or config.data.wai.output_path
-    )
-    item["download_filename"] = download_filename
-
-    if not download_filename:
-        _ = close_item(
-            item,
-            "No file at download location. Aborting main queue thread. (API will still function.)",
-            "download_fail.json",
-            subdir="history",
-        )
-        sys.exit(1)  # error condition
-
-    _log.msg(f"Download returned: {download_filename}")
-
-    return item
-
-
-def rename_and_move_item(item: dict) -> dict | None:
-    from util import tag_filename
-
-    tag_filepath = tag_filename(item.get("download_filename", ""))
-    file_name = os.path.basename(tag_filepath)
-
-    if config.data.wai.temp_path:  # NOT WORKING ?
-        safe_move(
-            tag_filepath,
-            os.path.join(os.path.abspath(config.data.wai.output_path), file_name),
-        )
-        _log.msg(
-            f"Moved: {tag_filepath} \n\t-> To: {os.path.abspath(config.data.wai.output_path)}"
         )
-        safe_move(
-            tag_filepath.replace(".mkv", ".info.json"),
-            os.path.join(
-                os.path.abspath(config.data.wai.output_path),
-                file_name.replace(".mkv", ".info.json"),
-            ),
-        )
-        _log.msg(
-            f"Moved: {tag_filepath.replace(".mkv", ".info.json")} \n\t-> To: {os.path.abspath(config.data.wai.output_path)}"
-        )
-
-    item["file_name"] = file_name
 
     return item
 
 
-def import_item(item: dict) -> dict | None:
-    from cfsonarr import import_downloaded_episode
-
-    _id = item["episode_result"].get("matched_series_id")
-    _season = item["episode_result"].get("season")
-    _episode = item["episode_result"].get("episode")
-    _filename = item["file_name"]
-    _folder = config.data.sonarr.in_path
-
-    import_result = import_downloaded_episode(
-        _id, _season, _episode, _filename, _folder
-    )
-
-    item["import_result"] = import_result
-
-    return item
-
-
-def process_item(item: dict | None) -> tuple[bool, dict | None]:
+def process_item(
+    item: dict | None, show_candidates: list[tuple[str, int]] | None = None
+) -> tuple[bool, dict | None]:
     from download_queue_manager import enqueue as enqueue_download
 
     if not item:
         return False, None
 
-    item = match_and_check(item)
+    item = match_and_check(item, show_candidates)
 
     if not item:
         return False, None
@@ -426,53 +360,37 @@ def process_item(item: dict | None) -> tuple[bool, dict | None]:
     if config.data.debug and config.data.debug.debug_break:
         breakpoint()
 
-    enqueue_download(item)
+    enqueue_download(item, source=decision_stage.checkpoint())
 
-    item = close_item(
-        item, "Item queued for download.", "download_enqueue.json", subdir="history"
-    )
+    item = close_item(item, "Item queued for download.", "download_enqueue.json")
 
     return False, item
 
 
-def process_queue(stop_event: threading.Event):
-    global item
-
-    if item is None:
-        item = _json.load_json("current_decision.json")
-    if decision_queue == []:
-        load_decision_queue()
+def process_items(items: list[dict], stop_event: threading.Event) -> bool:
+    """Decide a batch of items against one snapshot of the Sonarr data."""
+    from sonarr_cache import sonarr_snapshot
 
-    while not stop_event.is_set():
-        with decision_queue_condition:
-            while not item and not decision_queue and not stop_event.is_set():
-                if config.data.debug and config.data.debug.debug_print is True:
-                    _log.msg(
-                        f"No current item. No queue. Sleeping for at most {config.data.decision_queue.interval} min."
-                    )
-                decision_queue_condition.wait(
-                    timeout=config.data.decision_queue.interval * 60
-                )
+    wait_before_loop = False
+    with sonarr_snapshot():
+        if len(items) > 1:
+            _log.msg(f"Deciding batch of {len(items)} items.")
+        if len(items) > 1 and config.data.decision_queue.title_shortlist > 0:
+            _shortlists = batch_show_candidates(items)
+        else:
+            _shortlists = [None] * len(items)
 
-            if decision_queue and not item:
-                item = decision_queue.pop(0)
-                if config.data.decision_queue.flip_flop:
-                    _log.msg("Inverting queue")
-                    decision_queue.reverse()
-                _json.save_json(item, "current_decision.json", True)
-                _json.save_json(item, "all_processed.json", subdir="history")
-                save_decision_queue()
+        for _item, _shortlist in zip(items, _shortlists):
+            if stop_event.is_set():
+                # The rest stay in the checkpoint and resume on restart.
+                break
+            _wait, _ = process_item(_item, _shortlist)
+            wait_before_loop = wait_before_loop or _wait
 
-        if item:
-            wait_before_loop, item = process_item(item)
+    return wait_before_loop
 
-            if not wait_before_loop:
-                continue
 
-            _log.msg(
-                f"Queue thread sleeping for {config.data.decision_queue.interval} min."
-            )
-            with decision_queue_condition:
-                decision_queue_condition.wait(
-                    timeout=config.data.decision_queue.interval * 60
-                )
+def process_queue(stop_event: threading.Event, worker_index: int = 0):
+    decision_stage.run(
+        stop_event, worker_index, lambda _items: process_items(_items, stop_event)
+    )
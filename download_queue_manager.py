@@ -1,16 +1,14 @@
 # download_queue_manager.py
 
-import errno
-import json
 import os
-import shutil
 import sys
 import threading
-import uuid
+from typing import Callable
+from urllib.parse import urlsplit
 
-import fauxjson as _json
 import fauxlogger as _log
 from config import Config
+from queue_store import IndexedQueue, StageQueue
 from schema import WAIConfigRoot
 
 CONFIG_FILE: str = os.getenv("WAI_CONFIG_FILE", "./conf/wai.toml")
@@ -18,49 +16,162 @@ config: Config[WAIConfigRoot] = Config(
     schema=WAIConfigRoot, path=CONFIG_FILE, env_prefix="WAI_"
 )
 
-DOWNLOAD_QUEUE_FILE = os.path.join(
-    config.data.wai.data_dir, config.data.download_queue.file
-)
+DOWNLOAD_QUEUE = "download"
+
+
+def url_host(item: dict) -> str:
+    return (urlsplit(item.get("url", "")).hostname or "").removeprefix("www.")
+
+
+class HostQueues:
+    """The download queue split per host, in the stage's queue order.
+
+    Picking the next item only looks at the head of each host's queue, so a
+    backlog from one saturated host is skipped in one step rather than
+    scanned. Each item carries a rank giving its place in the whole queue;
+    ``reverse()`` flips the sign instead of renumbering.
+    """
 
-dl_queue_lock = threading.Lock()
-dl_queue_condition = threading.Condition(lock=dl_queue_lock)
-dl_queue = []
-dl_item = None
+    def __init__(self, items: list[dict] | None = None):
+        self._hosts: dict[str, IndexedQueue] = {}
+        self._rank: dict[str, int] = {}
+        self._sign = 1
+        # Bounds of the effective ranks (stored rank * sign) handed out so far.
+        self._first = 0
+        self._last = 0
+        self._reversed = False
+        for _item in items or []:
+            self.append(_item)
+
+    def append(self, item: dict) -> None:
+        _id = str(item["id"])
+        _host = url_host(item)
+
+        self._last += 1
+        self._rank[_id] = self._last * self._sign
+
+        _queue = self._hosts.get(_host)
+        if _queue is None:
+            _queue = self._hosts[_host] = IndexedQueue()
+            if self._reversed:
+                _queue.reverse()
+        _queue.append(item)
+
+    def remove(self, item: dict) -> None:
+        _id = str(item["id"])
+        _host = url_host(item)
+
+        self._rank.pop(_id, None)
+        _queue = self._hosts.get(_host)
+        if _queue is not None:
+            _queue.remove(_id)
+            if not _queue:
+                del self._hosts[_host]
+
+    def reverse(self) -> None:
+        self._reversed = not self._reversed
+        self._sign = -self._sign
+        self._first, self._last = -self._last, -self._first
+        for _queue in self._hosts.values():
+            _queue.reverse()
+
+    def first_eligible(self, eligible: Callable[[str], bool]) -> dict | None:
+        """The earliest queued item whose host passes ``eligible``."""
+        _best = None
+        _best_rank = 0
+
+        for _host, _queue in self._hosts.items():
+            if not eligible(_host):
+                continue
+            _head = next(iter(_queue))
+            _rank = self._rank[str(_head["id"])] * self._sign
+            if _best is None or _rank < _best_rank:
+                _best, _best_rank = _head, _rank
+
+        return _best
 
 
-def load_download_queue():
-    global dl_queue
-    dl_queue = []
-    if os.path.exists(DOWNLOAD_QUEUE_FILE):
-        with open(DOWNLOAD_QUEUE_FILE, "r") as f:
-            try:
-                data = json.load(f)
-                if isinstance(data, list):
-                    dl_queue.extend(data)
-            except json.JSONDecodeError:
-                _log.msg("Failed to decode queue JSON; starting with empty queue.")
+class DownloadStage(StageQueue):
+    """Download stage that caps concurrent downloads from any one host.
+
+    Items are picked from per-host queues, so hosts at
+    ``download_queue.per_host_threads`` are skipped without scanning their
+    backlog.
+    """
+
+    def __init__(self):
+        super().__init__(
+            DOWNLOAD_QUEUE,
+            lambda: config.data.download_queue,
+            lambda: config.data.download_queue.download_threads,
+            taken_history="all_processed.json",
+        )
+        self.hosts = HostQueues()
+        self.host_active: dict[str, int] = {}
+
+    def acquire_host(self, item: dict) -> None:
+        _host = url_host(item)
+        self.host_active[_host] = self.host_active.get(_host, 0) + 1
+
+    def release_host(self, item: dict) -> None:
+        _host = url_host(item)
+        self.host_active[_host] = self.host_active.get(_host, 1) - 1
+        if self.host_active[_host] <= 0:
+            self.host_active.pop(_host)
+
+    def _reload(self, items: list[dict]) -> None:
+        super()._reload(items)
+        self.hosts = HostQueues(items)
+
+    def _append(self, item: dict) -> None:
+        super()._append(item)
+        self.hosts.append(item)
+
+    def _remove(self, item_id: str) -> dict | None:
+        _item = super()._remove(item_id)
+        if _item is not None:
+            self.hosts.remove(_item)
+        return _item
+
+    def _pop(self) -> tuple[dict | None, bool]:
+        _limit = max(1, config.data.download_queue.per_host_threads)
+
+        _item = self.hosts.first_eligible(
+            lambda _host: self.host_active.get(_host, 0) < _limit
+        )
+        if _item is None:
+            return None, False
 
+        _was_front = next(iter(self.queue)) is _item
+        self._remove(str(_item["id"]))
+        self.acquire_host(_item)
 
-def save_download_queue():
-    with open(DOWNLOAD_QUEUE_FILE, "w") as f:
-        json.dump(dl_queue, f, indent=2)
+        return _item, _was_front
 
+    def _reverse(self) -> None:
+        super()._reverse()
+        self.hosts.reverse()
 
-def enqueue(item: dict):
-    with dl_queue_condition:
-        dl_queue.append(item)
-        save_download_queue()
+    def _resume(self, items: list[dict]) -> None:
+        for _item in items:
+            self.acquire_host(_item)
 
+    def _finished(self, items: list[dict]) -> None:
+        for _item in items:
+            self.release_host(_item)
+        # A host slot opened up; let waiting workers recheck the queue.
+        self.condition.notify_all()
 
-def dequeue(item: dict) -> bool:
-    with dl_queue_condition:
-        for i, q_item in enumerate(dl_queue):
-            if q_item == item:
-                del dl_queue[i]
-                save_download_queue()
 
-                return True
-        return False
+dl_stage = DownloadStage()
+
+
+def enqueue(item: dict, source: str | None = None):
+    dl_stage.enqueue(item, source)
+
+
+def dequeue(item: dict | str) -> bool:
+    return dl_stage.dequeue(item)
 
 
 def close_item(
@@ -68,56 +179,15 @@ def close_item(
     message: str,
     filename: str | None,
     stack_offset: int = 2,
-    subdir: str = "",
 ) -> dict | None:
-    if config.data.debug and config.data.debug.debug_break:
-        breakpoint()
-    _log.msg(message, stack_offset)
-    if filename:
-        _json.save_json(item, filename, subdir=subdir)
-    _json.delete_json_file("current_download.json")
+    dl_stage.close(item, message, filename, stack_offset)
 
     return None
 
 
-def safe_move(src, dst):
-    """Rename a file from ``src`` to ``dst``.
-
-    *   Moves must be atomic.  ``shutil.move()`` is not atomic.
-        Note that multiple threads may try to write to the cache at once,
-        so atomicity is required to ensure the serving on one thread doesn't
-        pick up a partially saved image from another thread.
-
-    *   Moves must work across filesystems.  Often temp directories and the
-        cache directories live on different filesystems.  ``os.rename()`` can
-        throw errors if run across filesystems.
-
-    So we try ``os.rename()``, but if we detect a cross-filesystem copy, we
-    switch to ``shutil.move()`` with some wrappers to make it atomic.
-    """
-    try:
-        os.rename(src, dst)
-    except OSError as err:
-
-        if err.errno == errno.EXDEV:
-            # Generate a unique ID, and copy `<src>` to the target directory
-            # with a temporary name `<dst>.<ID>.tmp`.  Because we're copying
-            # across a filesystem boundary, this initial copy may not be
-            # atomic.  We intersperse a random UUID so if different processes
-            # are copying into `<dst>`, they don't overlap in their tmp copies.
-            copy_id = uuid.uuid4()
-            tmp_dst = "%s.%s.tmp" % (dst, copy_id)
-            shutil.copyfile(src, tmp_dst)
-
-            # Then do an atomic rename onto the new name, and clean up the
-            # source image.
-            os.rename(tmp_dst, dst)
-            os.unlink(src)
-        else:
-            raise
-
-
 def process_item(item: dict | None) -> tuple[bool, dict | None]:
+    from postprocess_queue_manager import enqueue as enqueue_postprocess
+
     if not item:
         return False, None
 
@@ -134,22 +204,9 @@ def process_item(item: dict | None) -> tuple[bool, dict | None]:
     if not item:
         return False, None
 
-    item = rename_and_move_item(item)
-
-    if not item:
-        return False, None
-
-    item = import_item(item)
+    enqueue_postprocess(item, source=dl_stage.checkpoint())
 
-    if not item:
-        return False, None
-
-    item = close_item(
-        item,
-        f"Item Sonarr Import result: {item.get("import_result", {}).get('status', "")}",
-        "pass.json",
-        subdir="history",
-    )
+    item = close_item(item, "Item queued for post-processing.", None)
 
     return True, item
 
@@ -167,7 +224,6 @@ def download_item(item: dict) -> dict | None:
             item,
             "No file at download location. Aborting download queue thread. (API will still function.)",
             "download_fail.json",
-            subdir="history",
         )
         sys.exit(1)  # error condition
 
@@ -176,92 +232,5 @@ def download_item(item: dict) -> dict | None:
     return item
 
 
-def rename_and_move_item(item: dict) -> dict | None:
-    from util import tag_filename
-
-    tag_filepath = tag_filename(item.get("download_filename", ""))
-    file_name = os.path.basename(tag_filepath)
-
-    if config.data.wai.temp_path:  # NOT WORKING ?
-        safe_move(
-            tag_filepath,
-            os.path.join(os.path.abspath(config.data.wai.output_path), file_name),
-        )
-        _log.msg(
-            f"Moved: {tag_filepath} \n\t-> To: {os.path.abspath(config.data.wai.output_path)}"
-        )
-        safe_move(
-            tag_filepath.replace(".mkv", ".info.json"),
-            os.path.join(
-                os.path.abspath(config.data.wai.output_path),
-                file_name.replace(".mkv", ".info.json"),
-            ),
-        )
-        _log.msg(
-            f"Moved: {tag_filepath.replace(".mkv", ".info.json")} \n\t-> To: {os.path.abspath(config.data.wai.output_path)}"
-        )
-
-    item["file_name"] = file_name
-
-    return item
-
-
-def import_item(item: dict) -> dict | None:
-    from cfsonarr import import_downloaded_episode
-
-    _id = item["episode_result"].get("matched_series_id")
-    _season = item["episode_result"].get("season")
-    _episode = item["episode_result"].get("episode")
-    _filename = item["file_name"]
-    _folder = config.data.sonarr.in_path
-
-    import_result = import_downloaded_episode(
-        _id, _season, _episode, _filename, _folder
-    )
-
-    item["import_result"] = import_result
-
-    return item
-
-
-def process_queue(stop_event: threading.Event):
-    global dl_item
-
-    if dl_item is None:
-        dl_item = _json.load_json("current_download.json")
-    if dl_queue == []:
-        load_download_queue()
-
-    while not stop_event.is_set():
-        with dl_queue_condition:
-            while not dl_item and not dl_queue and not stop_event.is_set():
-                if config.data.debug and config.data.debug.debug_print is True:
-                    _log.msg(
-                        f"No current item. No queue. Sleeping for at most {config.data.download_queue.interval} min."
-                    )
-                dl_queue_condition.wait(
-                    timeout=config.data.download_queue.interval * 60
-                )
-
-            if dl_queue and not dl_item:
-                dl_item = dl_queue.pop(0)
-                if config.data.download_queue.flip_flop:
-                    _log.msg("Inverting queue")
-                    dl_queue.reverse()
-                _json.save_json(dl_item, "current_download.json", True)
-                _json.save_json(dl_item, "all_processed.json", subdir="history")
-                save_download_queue()
-
-        if dl_item:
-            wait_before_loop, dl_item = process_item(dl_item)
-
-            if not wait_before_loop:
-                continue
-
-            _log.msg(
-                f"Queue thread sleeping for {config.data.download_queue.interval} min."
-            )
-            with dl_queue_condition:
-                dl_queue_condition.wait(
-                    timeout=config.data.download_queue.interval * 60
-                )
+def process_queue(stop_event: threading.Event, worker_index: int = 0):
+    dl_stage.run(stop_event, worker_index, lambda _items: process_item(_items[0])[0])
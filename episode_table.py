@@ -0,0 +1,181 @@
+# episode_table.py
+
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+from datetime import datetime
+from typing import Any, Iterator
+
+ROW_KEYS: tuple[str, ...] = (
+    "has_file",
+    "series",
+    "series_id",
+    "season",
+    "episode",
+    "episode_id",
+    "tag",
+    "title",
+    "air_date",
+    "air_date_utc",
+)
+
+
+def _intern(value: str | None) -> str:
+    return sys.intern(value or "")
+
+
+def air_timestamp(air_date_utc: str | None) -> int:
+    """Epoch seconds of a Sonarr ``airDateUtc``, or -1 when it has none."""
+    if not air_date_utc:
+        return -1
+
+    try:
+        _aired = datetime.fromisoformat(air_date_utc.replace("Z", "+00:00"))
+    except ValueError:
+        return -1
+
+    return int(_aired.timestamp())
+
+
+class EpisodeTable:
+    """One series' episodes stored column-wise.
+
+    Numbers live in typed arrays and strings are interned, so a table costs a
+    few machine words per episode instead of one pyarr JSON dict each. Rows
+    are handed out as ``EpisodeRow`` views rather than copied.
+    """
+
+    def __init__(self, series_id: int, series_title: str, episodes: list[dict]):
+        self.series_id = series_id
+        self.series = _intern(series_title)
+        self.season = array("i")
+        self.episode = array("i")
+        self.episode_id = array("q")
+        self.has_file = array("b")
+        self.monitored = array("b")
+        self.air_ts = array("q")
+        self.title: list[str] = []
+        self.air_date: list[str] = []
+        self.air_date_utc: list[str] = []
+
+        for _ep in episodes:
+            self.season.append(_ep["seasonNumber"])
+            self.episode.append(_ep["episodeNumber"])
+            self.episode_id.append(_ep["id"])
+            self.has_file.append(bool(_ep["hasFile"]))
+            self.monitored.append(bool(_ep["monitored"]))
+            self.air_ts.append(air_timestamp(_ep.get("airDateUtc")))
+            self.title.append(_intern(_ep["title"]))
+            self.air_date.append(_intern(_ep.get("airDate", "")))
+            self.air_date_utc.append(_intern(_ep.get("airDateUtc", "")))
+
+        # Air-date index: row positions ordered by air time, undated rows left out.
+        _dated = sorted(
+            (_ts, _idx) for _idx, _ts in enumerate(self.air_ts) if _ts >= 0
+        )
+        self.air_sorted = array("q", [_ts for _ts, _ in _dated])
+        self.air_order = array("i", [_idx for _, _idx in _dated])
+
+    def __len__(self) -> int:
+        return len(self.episode_id)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, EpisodeTable):
+            return NotImplemented
+
+        return (
+            self.series_id == other.series_id
+            and self.series == other.series
+            and self.episode_id == other.episode_id
+            and self.season == other.season
+            and self.episode == other.episode
+            and self.has_file == other.has_file
+            and self.monitored == other.monitored
+            and self.air_ts == other.air_ts
+            and self.title == other.title
+            and self.air_date == other.air_date
+        )
+
+    def rows(
+        self, tag: str | None = None, monitored_only: bool = False
+    ) -> list["EpisodeRow"]:
+        return [
+            EpisodeRow(self, _idx, tag)
+            for _idx in range(len(self))
+            if not monitored_only or self.monitored[_idx]
+        ]
+
+    def rows_near(
+        self,
+        timestamp: int,
+        window: int,
+        tag: str | None = None,
+        monitored_only: bool = False,
+    ) -> list["EpisodeRow"]:
+        """Rows aired within ``window`` seconds of ``timestamp``, in air order."""
+        _lo = bisect_left(self.air_sorted, timestamp - window)
+        _hi = bisect_right(self.air_sorted, timestamp + window)
+
+        return [
+            EpisodeRow(self, _idx, tag)
+            for _idx in self.air_order[_lo:_hi]
+            if not monitored_only or self.monitored[_idx]
+        ]
+
+
+class EpisodeRow(Mapping):
+    """Read-only ``show_data`` row backed by an ``EpisodeTable``."""
+
+    __slots__ = ("table", "index", "tag")
+
+    def __init__(self, table: EpisodeTable, index: int, tag: str | None = None):
+        self.table = table
+        self.index = index
+        self.tag = tag
+
+    def __getitem__(self, key: str) -> Any:
+        _table = self.table
+        match key:
+            case "has_file":
+                return bool(_table.has_file[self.index])
+            case "series":
+                return _table.series
+            case "series_id":
+                return _table.series_id
+            case "season":
+                return _table.season[self.index]
+            case "episode":
+                return _table.episode[self.index]
+            case "episode_id":
+                return _table.episode_id[self.index]
+            case "tag":
+                return self.tag
+            case "title":
+                return _table.title[self.index]
+            case "air_date":
+                return _table.air_date[self.index]
+            case "air_date_utc":
+                return _table.air_date_utc[self.index]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(ROW_KEYS)
+
+    def __len__(self) -> int:
+        return len(ROW_KEYS)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+def to_plain(value: Any) -> Any:
+    """Copy of a match result with any ``EpisodeRow`` turned into a dict."""
+    if isinstance(value, EpisodeRow):
+        return dict(value)
+    if isinstance(value, dict):
+        return {_key: to_plain(_value) for _key, _value in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_plain(_value) for _value in value]
+
+    return value
@@ -0,0 +1,321 @@
+# history_store.py
+
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+from typing import BinaryIO, Final
+
+import fauxlogger as _log
+from config import Config
+from schema import WAIConfigRoot
+
+CONFIG_FILE: str = os.getenv("WAI_CONFIG_FILE", "./conf/wai.toml")
+config: Config[WAIConfigRoot] = Config(
+    schema=WAIConfigRoot, path=CONFIG_FILE, env_prefix="WAI_"
+)
+
+HISTORY_DIR: Final[str] = os.path.join(config.data.wai.data_dir, "history")
+INDEXED_FIELDS: Final[dict[str, str]] = {
+    "id": "item_id",
+    "url": "url",
+    "creator": "creator",
+}
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    item_id TEXT,
+    url TEXT,
+    creator TEXT,
+    segment TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    recorded INTEGER NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS entries_name ON entries(name, seq);
+CREATE INDEX IF NOT EXISTS entries_item_id ON entries(name, item_id);
+CREATE INDEX IF NOT EXISTS entries_url ON entries(name, url);
+CREATE INDEX IF NOT EXISTS entries_creator ON entries(name, creator);
+CREATE TABLE IF NOT EXISTS legacy_imports (
+    file TEXT PRIMARY KEY,
+    entries INTEGER NOT NULL
+);
+"""
+
+
+def history_name(filename: str) -> str:
+    """``"pass.json"``, ``"Pass"`` and ``"history/pass.json"`` all name ``pass``."""
+    return filename.lower().removeprefix("history/").removesuffix(".json")
+
+
+class HistoryStore:
+    """Append-only history, one JSONL segment series per history name.
+
+    Segments are named ``<name>.<YYYYMMDD>.<n>.jsonl`` and roll over daily or
+    once they reach ``segment_bytes``. A sidecar SQLite index records where
+    each entry lives, keyed by item ID, URL and creator, so lookups only read
+    the entries they return. Removal marks index rows deleted; segments are
+    never rewritten.
+    """
+
+    def __init__(self, history_dir: str, segment_bytes: int):
+        self.history_dir = history_dir
+        self.segment_bytes = max(1, segment_bytes)
+        os.makedirs(history_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(history_dir, "history_index.db"), check_same_thread=False
+        )
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(HISTORY_SCHEMA)
+
+        # name -> (day, segment file name, open handle)
+        self._segments: dict[str, tuple[str, str, BinaryIO]] = {}
+
+    def _segment(self, name: str, size: int) -> tuple[str, BinaryIO]:
+        _day = date.today().strftime("%Y%m%d")
+        _current = self._segments.get(name)
+
+        if _current and _current[0] == _day:
+            if _current[2].tell() + size <= self.segment_bytes:
+                return _current[1], _current[2]
+
+        if _current:
+            _current[2].close()
+
+        # Resume the newest segment for today if it still has room.
+        _existing = glob.glob(os.path.join(self.history_dir, f"{name}.{_day}.*.jsonl"))
+        _numbers = [
+            int(_path.rsplit(".", 2)[-2])
+            for _path in _existing
+            if _path.rsplit(".", 2)[-2].isdigit()
+        ]
+        _n = max(_numbers, default=0)
+        _file = f"{name}.{_day}.{_n}.jsonl"
+        _path = os.path.join(self.history_dir, _file)
+
+        if os.path.exists(_path) and os.path.getsize(_path) + size > self.segment_bytes:
+            _n += 1
+            _file = f"{name}.{_day}.{_n}.jsonl"
+            _path = os.path.join(self.history_dir, _file)
+
+        _fh = open(_path, "ab")
+        self._segments[name] = (_day, _file, _fh)
+
+        return _file, _fh
+
+    def record(self, item: dict, filename: str) -> None:
+        _name = history_name(filename)
+        _data = (json.dumps(item) + "\n").encode("utf-8")
+
+        with self._lock:
+            _file, _fh = self._segment(_name, len(_data))
+            _offset = _fh.tell()
+            _fh.write(_data)
+            _fh.flush()
+
+            self._db.execute(
+                "INSERT INTO entries"
+                " (name, item_id, url, creator, segment, offset, length, recorded)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    _name,
+                    item.get("id"),
+                    item.get("url"),
+                    str(item.get("creator", "")).lower() or None,
+                    _file,
+                    _offset,
+                    len(_data),
+                    int(time.time()),
+                ),
+            )
+            self._db.commit()
+
+    def import_legacy(self, legacy_file: str, items: list) -> int:
+        """Index the entries of a pre-segment ``<name>.json`` history file.
+
+        They are appended to the current segment but ordered ahead of every
+        entry already indexed, since they predate them. Returns the number
+        imported, or 0 if ``legacy_file`` was imported before.
+        """
+        _name = history_name(os.path.basename(legacy_file))
+        _items = [_item for _item in items if isinstance(_item, dict)]
+
+        with self._lock:
+            if self._db.execute(
+                "SELECT 1 FROM legacy_imports WHERE file=?", (legacy_file,)
+            ).fetchone():
+                return 0
+
+            _first = self._db.execute(
+                "SELECT COALESCE(MIN(seq), 1) FROM entries"
+            ).fetchone()[0]
+            _rows = []
+            for _idx, _item in enumerate(_items):
+                _data = (json.dumps(_item) + "\n").encode("utf-8")
+                _file, _fh = self._segment(_name, len(_data))
+                _offset = _fh.tell()
+                _fh.write(_data)
+                _rows.append(
+                    (
+                        _first - len(_items) + _idx,
+                        _name,
+                        _item.get("id"),
+                        _item.get("url"),
+                        str(_item.get("creator", "")).lower() or None,
+                        _file,
+                        _offset,
+                        len(_data),
+                        int(time.time()),
+                    )
+                )
+            for _, _, _fh in self._segments.values():
+                _fh.flush()
+
+            self._db.executemany(
+                "INSERT INTO entries"
+                " (seq, name, item_id, url, creator, segment, offset, length, recorded)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                _rows,
+            )
+            self._db.execute(
+                "INSERT INTO legacy_imports (file, entries) VALUES (?, ?)",
+                (legacy_file, len(_rows)),
+            )
+            self._db.commit()
+
+        return len(_rows)
+
+    def has(self, filename: str) -> bool:
+        with self._lock:
+            return (
+                self._db.execute(
+                    "SELECT 1 FROM entries WHERE name=? LIMIT 1",
+                    (history_name(filename),),
+                ).fetchone()
+                is not None
+            )
+
+    def _rows(
+        self, filename: str, field: str | None = None, value: str | None = None
+    ) -> list[tuple[int, str, int, int]]:
+        _name = history_name(filename)
+        _column = INDEXED_FIELDS.get(field or "")
+
+        with self._lock:
+            if _column and value is not None:
+                if _column == "creator":
+                    value = value.lower()
+                return self._db.execute(
+                    f"SELECT seq, segment, offset, length FROM entries"
+                    f" WHERE name=? AND {_column}=? AND deleted=0 ORDER BY seq",
+                    (_name, value),
+                ).fetchall()
+
+            return self._db.execute(
+                "SELECT seq, segment, offset, length FROM entries"
+                " WHERE name=? AND deleted=0 ORDER BY seq",
+                (_name,),
+            ).fetchall()
+
+    def _read(self, rows: list[tuple[int, str, int, int]]) -> list[dict]:
+        _entries = []
+        _handles: dict[str, BinaryIO] = {}
+
+        try:
+            for _, _segment, _offset, _length in rows:
+                _fh = _handles.get(_segment)
+                if _fh is None:
+                    _fh = open(os.path.join(self.history_dir, _segment), "rb")
+                    _handles[_segment] = _fh
+                _fh.seek(_offset)
+                _entries.append(json.loads(_fh.read(_length)))
+        finally:
+            for _fh in _handles.values():
+                _fh.close()
+
+        return _entries
+
+    def read(
+        self, filename: str, field: str | None = None, value: str | None = None
+    ) -> list[dict]:
+        """Entries of one history, in order; indexed fields are looked up directly."""
+        return self._read(self._rows(filename, field, value))
+
+    def remove(self, filename: str, item: dict) -> list[dict]:
+        if not item.get("id"):
+            return []
+
+        _rows = self._rows(filename, "id", str(item["id"]))
+        with self._lock:
+            self._db.executemany(
+                "UPDATE entries SET deleted=1 WHERE seq=?",
+                [(_row[0],) for _row in _rows],
+            )
+            self._db.commit()
+
+        return self._read(_rows)
+
+    def close(self) -> None:
+        with self._lock:
+            for _, _, _fh in self._segments.values():
+                _fh.close()
+            self._segments = {}
+            self._db.close()
+
+
+history: HistoryStore | None = None
+history_lock = threading.Lock()
+
+
+def migrate_legacy_history(history_store: HistoryStore) -> None:
+    """Import the old one-JSON-list-per-history files into segments, once."""
+    for _path in sorted(glob.glob(os.path.join(history_store.history_dir, "*.json"))):
+        _file = os.path.basename(_path)
+        with open(_path, "r", encoding="utf-8") as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError:
+                _log.msg(f"Failed to decode history/{_file}; not migrating it.")
+                continue
+        if not isinstance(data, list):
+            continue
+
+        _imported = history_store.import_legacy(_file, data)
+        if _imported:
+            _log.msg(f"Migrated {_imported} entries from history/{_file}.")
+        os.replace(_path, f"{_path}.migrated")
+
+
+def get_history() -> HistoryStore:
+    global history
+
+    with history_lock:
+        if history is None:
+            history = HistoryStore(
+                HISTORY_DIR, config.data.wai.history_segment_mb * 1024 * 1024
+            )
+            migrate_legacy_history(history)
+
+    return history
+
+
+def record_history(item: dict, filename: str) -> None:
+    get_history().record(item, filename)
+
+
+def close_history() -> None:
+    global history
+
+    with history_lock:
+        if history is not None:
+            history.close()
+            history = None
@@ -24,6 +24,16 @@ if __name__ == "__main__":
 
     _log.msg(f"Config: {CONFIG_FILE}")
 
+    if (
+        config.data.decision_queue.batch_size > 1
+        and config.data.decision_queue.title_shortlist <= 0
+    ):
+        _log.msg(
+            "Warning: decision_queue.batch_size > 1 only scores titles as a batch"
+            " when decision_queue.title_shortlist > 0; batches will share a Sonarr"
+            " snapshot but each item is matched against the whole library."
+        )
+
     retries = 0
     while retries < 5:
         if validate_sonarr_config(config.data.sonarr.url, config.data.sonarr.api):
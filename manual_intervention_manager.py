@@ -1,13 +1,12 @@
 # manual_intervention_manager.py
 
-import json
 import os
 import threading
 from typing import Callable, Final
 from uuid import uuid4
 
-import fauxlogger as _log
 from config import Config
+from queue_store import get_store
 from schema import WAIConfigRoot
 
 CONFIG_FILE: str = os.getenv("WAI_CONFIG_FILE", "./conf/wai.toml")
@@ -15,9 +14,7 @@ config: Config[WAIConfigRoot] = Config(
     schema=WAIConfigRoot, path=CONFIG_FILE, env_prefix="WAI_"
 )
 
-MI_QUEUE_FILE: Final[str] = os.path.join(
-    config.data.wai.data_dir, config.data.manual_intervention.file
-)
+MI_QUEUE: Final[str] = "mi"
 
 mi_queue_lock: Final = threading.Lock()
 mi_queue_notify_event: Final = threading.Event()
@@ -35,36 +32,30 @@ mi_notify_listeners: list[Callable[[mi_tuple_type], None]] = []
 def load_mi_queue():
     global mi_queue
     with mi_queue_lock:
-        mi_queue = {}
-        if os.path.exists(MI_QUEUE_FILE):
-            with open(MI_QUEUE_FILE, "r") as f:
-                try:
-                    data = json.load(f)
-                    if isinstance(data, dict):
-                        mi_queue.update(data)
-                except json.JSONDecodeError:
-                    _log.msg(
-                        "Failed to decode queue JSON; starting with empty manual intervention queue."
-                    )
+        mi_queue = {
+            str(_item["id"]): _item for _item in get_store().load(MI_QUEUE)
+        }
 
 
 def save_mi_queue():
     with mi_queue_lock:
-        with open(MI_QUEUE_FILE, "w") as f:
-            json.dump(mi_queue, f, indent=2)
+        get_store().put_many(list(mi_queue.values()), MI_QUEUE)
 
 
-def enqueue(mi_data: mi_inner_type) -> None:
+def enqueue(mi_data: mi_inner_type, source: str | None = None) -> None:
     global mi_current
     if len(mi_queue) == 0:
         load_mi_queue()
 
-    _uuid = str(uuid4())
+    _uuid = str(mi_data.setdefault("id", str(uuid4())))
 
     with mi_queue_lock:
+        if source is None:
+            get_store().put(mi_data, MI_QUEUE)
+        else:
+            get_store().move(mi_data, source, MI_QUEUE)
         mi_queue[_uuid] = mi_data
 
-    save_mi_queue()
     mi_current = (_uuid, mi_data)
     mi_queue_notify_event.set()
 
@@ -88,14 +79,23 @@ def get_mi_queue() -> mi_dict_type:
 
 
 def set_mi_queue_item(uuid: str, item: mi_inner_type):
+    item["id"] = uuid
     with mi_queue_lock:
+        get_store().put(item, MI_QUEUE)
         mi_queue[uuid] = item
-    save_mi_queue()
 
 
 def drop_mi_queue_item(uuid: str):
     with mi_queue_lock:
-        mi_queue.pop(uuid)
+        get_store().remove(mi_queue.pop(uuid), MI_QUEUE)
+
+
+def dequeue(uuid: str) -> bool:
+    if uuid not in mi_queue:
+        return False
+
+    drop_mi_queue_item(uuid)
+    return True
 
 
 def get_mi_queue_item(uuid: str) -> mi_inner_type:
@@ -0,0 +1,170 @@
+# match_memo.py
+
+import copy
+import os
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+from config import Config
+from schema import WAIConfigRoot
+
+CONFIG_FILE: str = os.getenv("WAI_CONFIG_FILE", "./conf/wai.toml")
+config: Config[WAIConfigRoot] = Config(
+    schema=WAIConfigRoot, path=CONFIG_FILE, env_prefix="WAI_"
+)
+
+
+class MatchResult(NamedTuple):
+    title_result: dict | None
+    episode_result: dict | None
+    series_ids: list[int]
+    series_version: tuple[int, int]
+    # Episode source cache key -> its version when matched.
+    episode_versions: dict[tuple, int]
+
+
+match_memo: OrderedDict[tuple, MatchResult] = OrderedDict()
+match_memo_lock = threading.Lock()
+match_memo_hits = 0
+match_memo_misses = 0
+# Creator -> (series_version(), consecutive items that matched no series).
+# Only a run of misses blocks a creator, so one odd title doesn't.
+unmatched_creators: dict[str, tuple[tuple[int, int], int]] = {}
+unmatched_rejects = 0
+
+
+def memo_key(item: dict) -> tuple[str, str, str]:
+    from rapidfuzz.utils import default_process
+
+    return (
+        default_process(str(item.get("title", ""))),
+        str(item.get("creator", "")).lower(),
+        str(item.get("datecode", "")),
+    )
+
+
+def lookup_match(item: dict) -> MatchResult | None:
+    """The remembered match for ``item``, if Sonarr hasn't changed since.
+
+    Only compares versions of what is already cached, so a lookup never loads
+    anything from Sonarr. The result only stands while everything it was
+    matched against is still cached and within its TTL; once any of it
+    expires, the item is matched afresh.
+    """
+    from sonarr_cache import cached_version, series_version, sonarr_cache
+
+    global match_memo_hits, match_memo_misses
+
+    _key = memo_key(item)
+    with match_memo_lock:
+        _result = match_memo.get(_key)
+
+    if _result is not None and (
+        not sonarr_cache.is_fresh(("series",))
+        or not all(map(sonarr_cache.is_fresh, _result.episode_versions))
+        or _result.series_version != series_version()
+        or any(
+            cached_version(_source) != _version
+            for _source, _version in _result.episode_versions.items()
+        )
+    ):
+        with match_memo_lock:
+            match_memo.pop(_key, None)
+        _result = None
+
+    with match_memo_lock:
+        if _result is None:
+            match_memo_misses += 1
+        else:
+            match_memo.move_to_end(_key)
+            match_memo_hits += 1
+
+    return _result
+
+
+def remember_match(
+    item: dict,
+    title_result: dict | None,
+    episode_result: dict | None,
+    series_ids: list[int],
+) -> None:
+    from sonarr_cache import episode_versions, series_version
+
+    # Copies, so later changes to the item's results don't leak into the memo.
+    _result = MatchResult(
+        copy.deepcopy(title_result),
+        copy.deepcopy(episode_result),
+        list(series_ids),
+        series_version(),
+        episode_versions(series_ids, item.get("datecode")),
+    )
+
+    _key = memo_key(item)
+    with match_memo_lock:
+        match_memo[_key] = _result
+        match_memo.move_to_end(_key)
+        while len(match_memo) > max(1, config.data.decision_queue.cache_size):
+            match_memo.popitem(last=False)
+
+
+def is_unmatched_creator(creator: str) -> bool:
+    """Whether ``creator``'s last ``decision_queue.negative_cache_misses`` items
+    in a row matched no series in the current series list.
+
+    Any change to the series list or the ``wai-`` tags voids the answer. Only
+    versions already cached are compared; nothing is loaded from Sonarr.
+    """
+    from sonarr_cache import series_version
+
+    global unmatched_rejects
+
+    _creator = creator.lower()
+    with match_memo_lock:
+        _entry = unmatched_creators.get(_creator)
+    if _entry is None:
+        return False
+
+    _version, _misses = _entry
+    if _version != series_version():
+        with match_memo_lock:
+            unmatched_creators.pop(_creator, None)
+        return False
+
+    if _misses < max(1, config.data.decision_queue.negative_cache_misses):
+        return False
+
+    with match_memo_lock:
+        unmatched_rejects += 1
+
+    return True
+
+
+def remember_unmatched_creator(creator: str) -> None:
+    """Count another of ``creator``'s items matching no series."""
+    from sonarr_cache import series_version
+
+    _creator = creator.lower()
+    _version = series_version()
+    with match_memo_lock:
+        _entry = unmatched_creators.pop(_creator, None)
+        _misses = _entry[1] + 1 if _entry and _entry[0] == _version else 1
+        unmatched_creators[_creator] = (_version, _misses)
+        while len(unmatched_creators) > max(1, config.data.decision_queue.cache_size):
+            del unmatched_creators[next(iter(unmatched_creators))]
+
+
+def forget_unmatched_creator(creator: str) -> None:
+    with match_memo_lock:
+        unmatched_creators.pop(creator.lower(), None)
+
+
+def memo_stats() -> dict[str, int]:
+    with match_memo_lock:
+        return {
+            "match_memo_size": len(match_memo),
+            "match_memo_hits": match_memo_hits,
+            "match_memo_misses": match_memo_misses,
+            "unmatched_creators": len(unmatched_creators),
+            "unmatched_rejects": unmatched_rejects,
+        }
@@ -0,0 +1,164 @@
+# postprocess_queue_manager.py
+
+import errno
+import os
+import shutil
+import threading
+import uuid
+
+import fauxlogger as _log
+from config import Config
+from queue_store import StageQueue
+from schema import WAIConfigRoot
+
+CONFIG_FILE: str = os.getenv("WAI_CONFIG_FILE", "./conf/wai.toml")
+config: Config[WAIConfigRoot] = Config(
+    schema=WAIConfigRoot, path=CONFIG_FILE, env_prefix="WAI_"
+)
+
+POSTPROCESS_QUEUE = "postprocess"
+
+pp_stage = StageQueue(
+    POSTPROCESS_QUEUE,
+    lambda: config.data.postprocess_queue,
+    lambda: config.data.postprocess_queue.postprocess_threads,
+)
+
+
+def enqueue(item: dict, source: str | None = None):
+    pp_stage.enqueue(item, source)
+
+
+def dequeue(item: dict | str) -> bool:
+    return pp_stage.dequeue(item)
+
+
+def close_item(
+    item: dict,
+    message: str,
+    filename: str | None,
+    stack_offset: int = 2,
+) -> dict | None:
+    pp_stage.close(item, message, filename, stack_offset)
+
+    return None
+
+
+def safe_move(src, dst):
+    """Rename a file from ``src`` to ``dst``.
+
+    *   Moves must be atomic.  ``shutil.move()`` is not atomic.
+        Note that multiple threads may try to write to the cache at once,
+        so atomicity is required to ensure the serving on one thread doesn't
+        pick up a partially saved image from another thread.
+
+    *   Moves must work across filesystems.  Often temp directories and the
+        cache directories live on different filesystems.  ``os.rename()`` can
+        throw errors if run across filesystems.
+
+    So we try ``os.rename()``, but if we detect a cross-filesystem copy, we
+    switch to ``shutil.move()`` with some wrappers to make it atomic.
+    """
+    try:
+        os.rename(src, dst)
+    except OSError as err:
+
+        if err.errno == errno.EXDEV:
+            # Generate a unique ID, and copy `<src>` to the target directory
+            # with a temporary name `<dst>.<ID>.tmp`.  Because we're copying
+            # across a filesystem boundary, this initial copy may not be
+            # atomic.  We intersperse a random UUID so if different processes
+            # are copying into `<dst>`, they don't overlap in their tmp copies.
+            copy_id = uuid.uuid4()
+            tmp_dst = "%s.%s.tmp" % (dst, copy_id)
+            shutil.copyfile(src, tmp_dst)
+
+            # Then do an atomic rename onto the new name, and clean up the
+            # source image.
+            os.rename(tmp_dst, dst)
+            os.unlink(src)
+        else:
+            raise
+
+
+def rename_and_move_item(item: dict) -> dict | None:
+    from util import tag_filename
+
+    tag_filepath = tag_filename(item.get("download_filename", ""))
+    file_name = os.path.basename(tag_filepath)
+
+    if config.data.wai.temp_path:  # NOT WORKING ?
+        safe_move(
+            tag_filepath,
+            os.path.join(os.path.abspath(config.data.wai.output_path), file_name),
+        )
+        _log.msg(
+            f"Moved: {tag_filepath} \n\t-> To: {os.path.abspath(config.data.wai.output_path)}"
+        )
+        safe_move(
+            tag_filepath.replace(".mkv", ".info.json"),
+            os.path.join(
+                os.path.abspath(config.data.wai.output_path),
+                file_name.replace(".mkv", ".info.json"),
+            ),
+        )
+        _log.msg(
+            f"Moved: {tag_filepath.replace(".mkv", ".info.json")} \n\t-> To: {os.path.abspath(config.data.wai.output_path)}"
+        )
+
+    item["file_name"] = file_name
+
+    return item
+
+
+def import_item(item: dict) -> dict | None:
+    from cfsonarr import import_downloaded_episode
+
+    _id = item["episode_result"].get("matched_series_id")
+    _season = item["episode_result"].get("season")
+    _episode = item["episode_result"].get("episode")
+    _filename = item["file_name"]
+    _folder = config.data.sonarr.in_path
+
+    import_result = import_downloaded_episode(
+        _id, _season, _episode, _filename, _folder
+    )
+
+    item["import_result"] = import_result
+
+    return item
+
+
+def process_item(item: dict | None) -> tuple[bool, dict | None]:
+    from creator_affinity import record_affinity
+
+    if not item:
+        return False, None
+
+    _log.msg(
+        f"Post-processing {_log._GREEN}{item.get('download_filename')}{_log._RESET}"
+    )
+
+    item = rename_and_move_item(item)
+
+    if not item:
+        return False, None
+
+    item = import_item(item)
+
+    if not item:
+        return False, None
+
+    record_affinity(item)
+
+    item = close_item(
+        item,
+        f"Item Sonarr Import result: {item.get('import_result', {}).get('status', '')}",
+        "pass.json",
+    )
+
+    return False, item
+
+
+def process_queue(stop_event: threading.Event, worker_index: int = 0):
+    pp_stage.run(stop_event, worker_index, lambda _items: process_item(_items[0])[0])
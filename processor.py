@@ -4,6 +4,7 @@
 import json
 import os
 import re
+from uuid import uuid4
 
 from config import Config
 from schema import WAIConfigRoot
@@ -14,6 +15,16 @@ config: Config[WAIConfigRoot] = Config(
 )
 
 
+def new_item(creator: str, title: str, datecode: str, url: str) -> dict:
+    return {
+        "id": str(uuid4()),
+        "creator": creator.strip(),
+        "title": title.strip(),
+        "datecode": datecode.strip(),
+        "url": url.strip(),
+    }
+
+
 def process_message(raw_text: str) -> dict:
     # Pattern to match the format: CREATOR :: DATECODE :: TITLE\n\nURL
     pattern = re.compile(
@@ -26,18 +37,34 @@ def process_message(raw_text: str) -> dict:
 
     creator, datecode, title, url = match.groups()
 
+    return new_item(creator, title, datecode, url)
+
+
+def get_store_queue(from_file: str) -> str | None:
     return {
-        "creator": creator.strip(),
-        "title": title.strip(),
-        "datecode": datecode.strip(),
-        "url": url.strip(),
-    }
+        config.data.decision_queue.file.lower(): "decision",
+        config.data.download_queue.file.lower(): "download",
+        config.data.postprocess_queue.file.lower(): "postprocess",
+        config.data.aging_queue.file.lower(): "aging",
+        config.data.manual_intervention.file.lower(): "mi",
+    }.get(from_file.lower())
 
 
 def get_json_items(from_file: str) -> list[dict]:
     if not from_file.endswith(".json"):
         from_file += ".json"
 
+    _queue = get_store_queue(from_file)
+    if _queue:
+        from queue_store import get_store
+
+        return get_store().load(_queue)
+
+    from history_store import get_history
+
+    if get_history().has(from_file):
+        return get_history().read(from_file)
+
     file_path = os.path.join(config.data.wai.data_dir, from_file.lower())
 
     if not os.path.isfile(file_path):
@@ -60,6 +87,11 @@ def get_json_items_filtered(
     if name is None and value is None:
         return get_json_items(from_file)
 
+    from history_store import INDEXED_FIELDS, get_history
+
+    if name in INDEXED_FIELDS and value is not None and get_history().has(from_file):
+        return get_history().read(from_file, name, value)
+
     filtered = [
         entry
         for entry in get_json_items(from_file)
@@ -74,14 +106,38 @@ def get_json_items_filtered(
     return filtered
 
 
+def dequeue_store_item(queue: str, item: dict) -> bool:
+    match queue:
+        case "decision":
+            from decision_queue_manager import dequeue
+        case "download":
+            from download_queue_manager import dequeue
+        case "postprocess":
+            from postprocess_queue_manager import dequeue
+        case "aging":
+            from aging_queue_manager import dequeue
+        case "mi":
+            from manual_intervention_manager import dequeue
+        case _:
+            return False
+
+    return dequeue(str(item.get("id", "")))
+
+
 def add_json_item(to_file: str, item: dict) -> dict:
     to_file = to_file.lower()
     if not to_file.endswith(".json"):
         to_file += ".json"
 
-    if to_file == "queue.json":
+    if to_file == "queue.json" or get_store_queue(to_file):
         return {"error": "Cannot operate directly on queue"}
 
+    from history_store import get_history
+
+    if get_history().has(to_file):
+        get_history().record(item, to_file)
+        return {"added": item}
+
     file_path = os.path.join(config.data.wai.data_dir, to_file)
 
     if os.path.exists(file_path):
@@ -111,6 +167,15 @@ def remove_json_item(from_file: str, item: dict) -> dict:
     if from_file == "queue.json":
         return {"error": "Cannot operate directly on queue"}
 
+    _queue = get_store_queue(from_file)
+    if _queue:
+        return {"removed": [item] if dequeue_store_item(_queue, item) else []}
+
+    from history_store import get_history
+
+    if get_history().has(from_file):
+        return {"removed": get_history().remove(from_file, item)}
+
     file_path = os.path.join(config.data.wai.data_dir, from_file)
     if not os.path.exists(file_path):
         return {"error": "File not found"}
@@ -132,7 +197,7 @@ def remove_json_item(from_file: str, item: dict) -> dict:
             remaining.append(entry)
             continue
 
-        if item == entry:
+        if (item.get("id") and item.get("id") == entry.get("id")) or item == entry:
             removed.append(entry)
         else:
             remaining.append(entry)
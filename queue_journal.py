@@ -0,0 +1,110 @@
+# queue_journal.py
+
+import json
+import os
+
+import fauxlogger as _log
+
+
+class QueueJournal:
+    """Append-only write-ahead journal for a list-backed queue.
+
+    Every mutation is appended to the journal as a single JSON line, so the
+    cost of an enqueue does not depend on the size of the queue. Once
+    ``compact_every`` records have accumulated, the journal is atomically
+    replaced by a new one that starts with a snapshot of the full queue.
+
+    Callers are expected to serialize access (the queue managers already hold
+    their queue lock around every mutation).
+    """
+
+    def __init__(self, queue_file: str, compact_every: int = 1000):
+        self.legacy_file = queue_file
+        self.journal_file = f"{os.path.splitext(queue_file)[0]}.journal"
+        self.compact_every = max(1, compact_every)
+        self.records = 0
+        self._fh = None
+
+    def _open(self):
+        if self._fh is None:
+            self._fh = open(self.journal_file, "a", encoding="utf-8")
+        return self._fh
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    @staticmethod
+    def _apply(items: list, record: dict):
+        match record.get("op"):
+            case "snapshot":
+                items.clear()
+                items.extend(record.get("items", []))
+            case "enqueue":
+                items.append(record["item"])
+            case "pop" | "dequeue":
+                _index = record.get("index", 0)
+                if -len(items) <= _index < len(items):
+                    del items[_index]
+            case "reverse":
+                items.reverse()
+
+    def replay(self) -> list:
+        items = []
+        self.close()
+        self.records = 0
+
+        if not os.path.exists(self.journal_file):
+            # First start on this journal: adopt the old full-file queue, if any.
+            if os.path.exists(self.legacy_file):
+                with open(self.legacy_file, "r") as f:
+                    try:
+                        data = json.load(f)
+                        if isinstance(data, list):
+                            items.extend(data)
+                    except json.JSONDecodeError:
+                        _log.msg(
+                            "Failed to decode queue JSON; starting with empty queue."
+                        )
+            self.compact(items)
+            if os.path.exists(self.legacy_file):
+                os.remove(self.legacy_file)
+
+            return items
+
+        with open(self.journal_file, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final write from a crash; everything before it is intact.
+                    _log.msg("Truncated journal record; stopping replay.")
+                    break
+                self._apply(items, record)
+                self.records += 1
+
+        return items
+
+    def append(self, op: str, **fields) -> bool:
+        """Append one record. Returns True when the journal is due for compaction."""
+        _fh = self._open()
+        _fh.write(json.dumps({"op": op, **fields}) + "\n")
+        _fh.flush()
+        self.records += 1
+
+        return self.records >= self.compact_every
+
+    def compact(self, items: list):
+        self.close()
+        tmp_file = f"{self.journal_file}.tmp"
+
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"op": "snapshot", "items": items}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp_file, self.journal_file)
+        self.records = 1
@@ -0,0 +1,621 @@
+# queue_store.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Iterator
+from uuid import uuid4
+
+import fauxjson as _json
+import fauxlogger as _log
+from config import Config
+from schema import BaseQueueConfig, WAIConfigRoot
+
+CONFIG_FILE: str = os.getenv("WAI_CONFIG_FILE", "./conf/wai.toml")
+config: Config[WAIConfigRoot] = Config(
+    schema=WAIConfigRoot, path=CONFIG_FILE, env_prefix="WAI_"
+)
+
+QUEUE_STORE_FILE = os.path.join(
+    config.data.wai.data_dir, config.data.wai.queue_store_file
+)
+
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS membership (
+    item_id TEXT PRIMARY KEY REFERENCES items(id) ON DELETE CASCADE,
+    queue TEXT NOT NULL,
+    seq INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS membership_queue_seq ON membership(queue, seq);
+"""
+
+
+class QueueStore:
+    """SQLite (WAL) store holding every queued item and the queue it belongs to.
+
+    An item is a member of exactly one queue at a time, so moving it between
+    stages (decision -> aging, aging -> decision, ...) is a single
+    transaction that rewrites its data row and its membership row.
+
+    Mutations are group-committed: they are handed to a writer thread which
+    gathers everything submitted within ``commit_window_ms`` and commits it
+    as one transaction. Every mutation returns a future that resolves once it
+    is durable, or carries the error if it was not stored.
+    """
+
+    def __init__(self, path: str, commit_window_ms: int = 20):
+        self.path = path
+        self.commit_window = max(0, commit_window_ms) / 1000
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute("PRAGMA foreign_keys=ON")
+        self._db.executescript(STORE_SCHEMA)
+
+        self._pending: list[tuple[Callable | None, Future]] = []
+        self._pending_condition = threading.Condition()
+        self._flush_now = False
+        self._closing = False
+        self._writer = threading.Thread(
+            target=self._writer_loop, daemon=True, name="queue_store_writer"
+        )
+        self._writer.start()
+
+    def _submit(self, op: Callable | None, urgent: bool = False) -> Future:
+        _done = Future()
+        with self._pending_condition:
+            if self._closing:
+                raise RuntimeError("Queue store is closed")
+            self._pending.append((op, _done))
+            self._flush_now = self._flush_now or urgent
+            self._pending_condition.notify()
+
+        return _done
+
+    def _writer_loop(self):
+        while True:
+            with self._pending_condition:
+                while not self._pending and not self._closing:
+                    self._pending_condition.wait()
+                if not self._pending and self._closing:
+                    return
+
+                # Gather whatever else arrives within the commit window.
+                _deadline = time.monotonic() + self.commit_window
+                while not self._flush_now and not self._closing:
+                    _remaining = _deadline - time.monotonic()
+                    if _remaining <= 0:
+                        break
+                    self._pending_condition.wait(timeout=_remaining)
+
+                _batch = self._pending
+                self._pending = []
+                self._flush_now = False
+
+            try:
+                self._commit(_batch)
+            except Exception as err:
+                # Keep the writer alive; waiters learn their writes were lost.
+                _log.msg(f"Queue store writer failed: {err}")
+                for _, _done in _batch:
+                    if not _done.done():
+                        _done.set_exception(err)
+
+    def _commit(self, batch: list[tuple[Callable | None, Future]]):
+        _errors: list[Exception | None] = [None] * len(batch)
+
+        with self._lock:
+            try:
+                self._db.execute("BEGIN IMMEDIATE")
+                for _idx, (_op, _) in enumerate(batch):
+                    if _op is None:
+                        continue
+                    # One failed op must not take the rest of the batch with it.
+                    self._db.execute("SAVEPOINT queue_op")
+                    try:
+                        _op(self._db)
+                    except Exception as err:
+                        _log.msg(f"Queue store operation failed: {err}")
+                        self._db.execute("ROLLBACK TO queue_op")
+                        _errors[_idx] = err
+                    self._db.execute("RELEASE queue_op")
+                self._db.execute("COMMIT")
+            except sqlite3.Error as err:
+                _log.msg(f"Queue store commit failed: {err}")
+                if self._db.in_transaction:
+                    self._db.execute("ROLLBACK")
+                _errors = [err] * len(batch)
+
+        for (_, _done), _error in zip(batch, _errors):
+            if _error is None:
+                _done.set_result(None)
+            else:
+                _done.set_exception(_error)
+
+    @staticmethod
+    def _put(
+        db: sqlite3.Connection, _id: str, data: str, queue: str, front: bool
+    ) -> None:
+        db.execute(
+            "INSERT INTO items (id, data, updated) VALUES (?, ?, ?)"
+            " ON CONFLICT(id) DO UPDATE SET data=excluded.data, updated=excluded.updated",
+            (_id, data, int(time.time())),
+        )
+
+        _row = db.execute(
+            "SELECT queue FROM membership WHERE item_id=?", (_id,)
+        ).fetchone()
+        if _row and _row[0] == queue and not front:
+            # Updated in place; keep its position.
+            return
+
+        if front:
+            _seq = db.execute(
+                "SELECT COALESCE(MIN(seq), 0) - 1 FROM membership WHERE queue=?",
+                (queue,),
+            ).fetchone()[0]
+        else:
+            _seq = db.execute(
+                "SELECT COALESCE(MAX(seq), 0) + 1 FROM membership WHERE queue=?",
+                (queue,),
+            ).fetchone()[0]
+
+        db.execute(
+            "INSERT INTO membership (item_id, queue, seq) VALUES (?, ?, ?)"
+            " ON CONFLICT(item_id) DO UPDATE SET queue=excluded.queue, seq=excluded.seq",
+            (_id, queue, _seq),
+        )
+
+    @staticmethod
+    def _move(
+        db: sqlite3.Connection, _id: str, data: str, src: str, dst: str, front: bool
+    ) -> None:
+        db.execute("DELETE FROM membership WHERE item_id=? AND queue=?", (_id, src))
+        QueueStore._put(db, _id, data, dst, front)
+
+    @staticmethod
+    def _remove(db: sqlite3.Connection, _id: str, queue: str | None) -> None:
+        if queue is None:
+            _cur = db.execute("DELETE FROM membership WHERE item_id=?", (_id,))
+        else:
+            _cur = db.execute(
+                "DELETE FROM membership WHERE item_id=? AND queue=?", (_id, queue)
+            )
+
+        if _cur.rowcount > 0:
+            db.execute("DELETE FROM items WHERE id=?", (_id,))
+
+    def put(self, item: dict, queue: str, front: bool = False) -> Future:
+        """Insert or update ``item`` and make it a member of ``queue``.
+
+        An item already in another queue is moved in the same transaction.
+        The item is serialized now; later changes to the dict are not stored.
+        """
+        _id = str(item.setdefault("id", str(uuid4())))
+        _data = json.dumps(item)
+
+        return self._submit(lambda db: self._put(db, _id, _data, queue, front))
+
+    def put_many(self, items: list[dict], queue: str) -> Future:
+        _rows = [
+            (str(_item.setdefault("id", str(uuid4()))), json.dumps(_item))
+            for _item in items
+        ]
+
+        def _op(db: sqlite3.Connection):
+            for _id, _data in _rows:
+                self._put(db, _id, _data, queue, False)
+
+        return self._submit(_op)
+
+    def move(self, item: dict, src: str, dst: str, front: bool = False) -> Future:
+        """Move ``item`` from queue ``src`` to ``dst`` as one store operation.
+
+        The data and membership rows change in the same transaction, so a
+        crash leaves the item either still in ``src`` or already in ``dst``.
+        It lands in ``dst`` even if it had already left ``src``.
+        """
+        _id = str(item.setdefault("id", str(uuid4())))
+        _data = json.dumps(item)
+
+        return self._submit(lambda db: self._move(db, _id, _data, src, dst, front))
+
+    def remove(self, item: dict, queue: str | None = None) -> Future:
+        """Drop ``item`` from the store.
+
+        With ``queue`` set, only drop it if it is still a member of that queue;
+        an item that has since moved to another stage is left alone.
+        """
+        _id = item.get("id")
+        if not _id:
+            _done = Future()
+            _done.set_result(None)
+            return _done
+
+        return self._submit(lambda db: self._remove(db, str(_id), queue))
+
+    def reverse(self, queue: str) -> Future:
+        return self._submit(
+            lambda db: db.execute(
+                "UPDATE membership SET seq = -seq WHERE queue=?", (queue,)
+            )
+        )
+
+    def flush(self) -> None:
+        """Commit everything submitted so far, without waiting out the window."""
+        # Only waits; failures are reported to the waiters of the failed ops.
+        self._submit(None, urgent=True).exception()
+
+    def load(self, queue: str) -> list[dict]:
+        self.flush()
+        with self._lock:
+            _rows = self._db.execute(
+                "SELECT items.data FROM membership"
+                " JOIN items ON items.id = membership.item_id"
+                " WHERE membership.queue=? ORDER BY membership.seq",
+                (queue,),
+            ).fetchall()
+
+        return [json.loads(_row[0]) for _row in _rows]
+
+    def queue_names(self, prefix: str) -> list[str]:
+        """Names of non-empty queues equal to ``prefix`` or under ``prefix.``."""
+        self.flush()
+        with self._lock:
+            _rows = self._db.execute(
+                "SELECT DISTINCT queue FROM membership WHERE queue=? OR queue LIKE ?",
+                (prefix, f"{prefix}.%"),
+            ).fetchall()
+
+        return [_row[0] for _row in _rows]
+
+    def count(self, queue: str) -> int:
+        self.flush()
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM membership WHERE queue=?", (queue,)
+            ).fetchone()[0]
+
+    def close(self) -> None:
+        with self._pending_condition:
+            self._closing = True
+            self._pending_condition.notify()
+        self._writer.join()
+
+        with self._lock:
+            self._db.close()
+
+
+class IndexedQueue:
+    """In-memory FIFO of items keyed by their ``id``.
+
+    Append, pop and removal by ID are all O(1). ``reverse()`` flips which end
+    is the front without touching the items, for ``flip_flop`` queues.
+    """
+
+    def __init__(self, items: list[dict] | None = None):
+        self._items: OrderedDict[str, dict] = OrderedDict()
+        self._reversed = False
+        for _item in items or []:
+            self.append(_item)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(
+            reversed(self._items.values()) if self._reversed else self._items.values()
+        )
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._items
+
+    def append(self, item: dict) -> None:
+        _id = str(item["id"])
+        self._items[_id] = item
+        self._items.move_to_end(_id, last=not self._reversed)
+
+    def popleft(self) -> dict:
+        return self._items.popitem(last=self._reversed)[1]
+
+    def get(self, item_id: str) -> dict | None:
+        return self._items.get(item_id)
+
+    def remove(self, item_id: str) -> dict | None:
+        return self._items.pop(item_id, None)
+
+    def reverse(self) -> None:
+        self._reversed = not self._reversed
+
+
+def debounce_wait(condition: threading.Condition, debounce_ms: int) -> None:
+    """Hold a woken worker for ``debounce_ms`` so the rest of a burst can land.
+
+    Caller must hold ``condition``; it is released while waiting, so enqueues
+    (and their notifies) still go through.
+    """
+    _deadline = time.monotonic() + debounce_ms / 1000
+    while (_remaining := _deadline - time.monotonic()) > 0:
+        condition.wait(timeout=_remaining)
+
+
+class StageQueue:
+    """A worker stage: its queue, the workers' in-flight checkpoints and loop.
+
+    Items live in store queue ``name`` while waiting. A worker takes them
+    into its own checkpoint, ``<name>.current.<worker index>``, and they stay
+    there until handed on or closed, so a restart resumes them. Subclasses
+    can change how the next item is picked by overriding the ``_`` hooks.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        settings: Callable[[], BaseQueueConfig],
+        workers: Callable[[], int],
+        batch_size: Callable[[], int] = lambda: 1,
+        taken_history: str | None = None,
+    ):
+        self.name = name
+        self.current = f"{name}.current"
+        self.settings = settings
+        self.workers = workers
+        self.batch_size = batch_size
+        self.taken_history = taken_history
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(lock=self.lock)
+        self.queue = IndexedQueue()
+        self.loaded = False
+        self._worker = threading.local()
+
+    def checkpoint(self) -> str:
+        """In-flight checkpoint queue of the calling worker."""
+        return f"{self.current}.{getattr(self._worker, 'index', 0)}"
+
+    def load(self) -> None:
+        """Load the queue from the store. Caller must hold ``condition``."""
+        _store = get_store()
+
+        # Checkpoints of workers that no longer exist (pool shrunk, or an old
+        # single-worker checkpoint) go back to the front of the queue.
+        _workers = {f"{self.current}.{_idx}" for _idx in range(max(1, self.workers()))}
+        for _queue in _store.queue_names(self.current):
+            if _queue not in _workers:
+                for _orphan in _store.load(_queue):
+                    _log.msg(f"Requeueing in-flight item from {_queue}.")
+                    _store.move(_orphan, _queue, self.name, front=True)
+
+        self._reload(_store.load(self.name))
+        self.loaded = True
+
+    def enqueue(self, item: dict, source: str | None = None) -> Future:
+        """Queue ``item``, moving it out of store queue ``source`` if given."""
+        with self.condition:
+            if source is None:
+                _committed = get_store().put(item, self.name)
+            else:
+                _committed = get_store().move(item, source, self.name)
+            self._append(item)
+            self.condition.notify()
+
+        return _committed
+
+    def dequeue(self, item: dict | str) -> bool:
+        _id = item if isinstance(item, str) else str(item.get("id", ""))
+
+        with self.condition:
+            q_item = self._remove(_id)
+            if q_item is None:
+                return False
+
+            get_store().remove(q_item, self.name)
+            return True
+
+    def close(
+        self, item: dict, message: str, filename: str | None, stack_offset: int = 2
+    ) -> None:
+        """Log ``message``, record history and drop ``item`` from our checkpoint.
+
+        An item already handed on to another queue is left there.
+        """
+        from history_store import record_history
+
+        if config.data.debug and config.data.debug.debug_break:
+            breakpoint()
+        _log.msg(message, stack_offset + 1)
+        if filename:
+            record_history(item, filename)
+        get_store().remove(item, self.checkpoint())
+
+    def take(self) -> list[dict]:
+        """Move up to ``batch_size`` items into our checkpoint.
+
+        Caller must hold ``condition``.
+        """
+        from history_store import record_history
+
+        _items = []
+        while len(_items) < max(1, self.batch_size()):
+            _item, _was_front = self._pop()
+            if _item is None:
+                break
+
+            get_store().move(_item, self.name, self.checkpoint())
+            # Only a pop from the front keeps the alternation going.
+            if self.settings().flip_flop and _was_front:
+                _log.msg("Inverting queue")
+                self._reverse()
+                get_store().reverse(self.name)
+            if self.taken_history:
+                record_history(_item, self.taken_history)
+            _items.append(_item)
+
+        return _items
+
+    def run(
+        self,
+        stop_event: threading.Event,
+        worker_index: int,
+        process: Callable[[list[dict]], bool],
+    ) -> None:
+        """Worker loop: take items and hand them to ``process`` until stopped.
+
+        ``process`` returns whether to pause for the queue's interval before
+        taking more.
+        """
+        self._worker.index = worker_index
+
+        # Everything in our checkpoint was taken but not finished before a restart.
+        items = get_store().load(self.checkpoint())
+        with self.condition:
+            if not self.loaded:
+                self.load()
+            self._resume(items)
+
+        while not stop_event.is_set():
+            _interval = self.settings().interval
+            with self.condition:
+                while not items and not stop_event.is_set():
+                    items = self.take()
+                    if items:
+                        break
+
+                    if config.data.debug and config.data.debug.debug_print is True:
+                        _log.msg(
+                            f"No current item. No queue. Sleeping for at most {_interval} min."
+                        )
+                    self.condition.wait(timeout=_interval * 60)
+                    if self.queue and self.settings().wake_debounce_ms:
+                        debounce_wait(self.condition, self.settings().wake_debounce_ms)
+
+            if not items:
+                continue
+
+            try:
+                wait_before_loop = process(items)
+            finally:
+                with self.condition:
+                    self._finished(items)
+            items = []
+
+            if not wait_before_loop:
+                continue
+
+            _log.msg(f"Queue thread sleeping for {_interval} min.")
+            # Pacing between items; new enqueues must not cut it short.
+            stop_event.wait(timeout=_interval * 60)
+
+    def _reload(self, items: list[dict]) -> None:
+        self.queue = IndexedQueue(items)
+
+    def _append(self, item: dict) -> None:
+        self.queue.append(item)
+
+    def _remove(self, item_id: str) -> dict | None:
+        return self.queue.remove(item_id)
+
+    def _pop(self) -> tuple[dict | None, bool]:
+        """The next item to take, and whether it was at the front."""
+        return (self.queue.popleft(), True) if self.queue else (None, False)
+
+    def _reverse(self) -> None:
+        self.queue.reverse()
+
+    def _resume(self, items: list[dict]) -> None:
+        """Called with checkpointed items a worker resumes after a restart."""
+
+    def _finished(self, items: list[dict]) -> None:
+        """Called once ``process`` is done with taken items."""
+
+
+store: QueueStore | None = None
+store_lock = threading.Lock()
+
+
+def migrate_legacy_files(queue_store: QueueStore) -> None:
+    """Import the old per-manager JSON queue files and checkpoints, once."""
+    from queue_journal import QueueJournal
+
+    _data_dir = config.data.wai.data_dir
+    _sources = [
+        (config.data.decision_queue.file, "decision"),
+        (config.data.download_queue.file, "download"),
+        (config.data.aging_queue.file, "aging"),
+        (config.data.manual_intervention.file, "mi"),
+    ]
+
+    # Each legacy file is only set aside once its items are committed, so a
+    # crash or failed commit leaves it in place to migrate again.
+    for _file, _queue in _sources:
+        _path = os.path.join(_data_dir, _file)
+        _journal = QueueJournal(_path)
+        _items = []
+
+        if _queue == "decision" and os.path.exists(_journal.journal_file):
+            _items = _journal.replay()
+            _journal.close()
+            _path = _journal.journal_file
+        elif os.path.exists(_path):
+            with open(_path, "r") as f:
+                try:
+                    data = json.load(f)
+                except json.JSONDecodeError:
+                    _log.msg(f"Failed to decode {_file}; not migrating it.")
+                    continue
+            if isinstance(data, list):
+                _items = data
+            elif isinstance(data, dict):
+                # Manual intervention queue is keyed by item UUID.
+                for _key, _item in data.items():
+                    _item.setdefault("id", _key)
+                    _items.append(_item)
+        else:
+            continue
+
+        if _items:
+            _log.msg(f"Migrating {len(_items)} items from {_file} to queue store.")
+            queue_store.put_many(_items, _queue).result()
+        os.replace(_path, f"{_path}.migrated")
+
+    for _file, _queue in [
+        ("current_decision.json", "decision.current"),
+        ("current_download.json", "download.current"),
+        ("current_aging.json", "aging.current"),
+    ]:
+        _item = _json.load_json(_file)
+        if _item:
+            queue_store.put(_item, _queue).result()
+            _json.delete_json_file(_file)
+
+
+def get_store() -> QueueStore:
+    global store
+
+    with store_lock:
+        if store is None:
+            os.makedirs(os.path.dirname(QUEUE_STORE_FILE) or ".", exist_ok=True)
+            store = QueueStore(
+                QUEUE_STORE_FILE, config.data.wai.queue_commit_window_ms
+            )
+            migrate_legacy_files(store)
+
+    return store
+
+
+def close_store() -> None:
+    global store
+
+    with store_lock:
+        if store is not None:
+            store.close()
+            store = None
@@ -0,0 +1,154 @@
+# refresh_scheduler.py
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+import fauxlogger as _log
+from config import Config
+from schema import WAIConfigRoot
+
+CONFIG_FILE: str = os.getenv("WAI_CONFIG_FILE", "./conf/wai.toml")
+config: Config[WAIConfigRoot] = Config(
+    schema=WAIConfigRoot, path=CONFIG_FILE, env_prefix="WAI_"
+)
+
+FINISHED_STATUSES = ("completed", "failed", "aborted", "cancelled", "orphaned")
+
+refresh_lock = threading.Lock()
+refresh_condition = threading.Condition(lock=refresh_lock)
+# Series waiting for a refresh command, oldest request first.
+refresh_pending: OrderedDict[int, None] = OrderedDict()
+# Series with a refresh command running -> its command ID (None while posting).
+refresh_inflight: dict[int, int | None] = {}
+# Series -> monotonic time its last refresh command was issued.
+refresh_last: dict[int, float] = {}
+# Monotonic issue times of the refresh commands sent in the last hour.
+refresh_issued: deque[float] = deque()
+
+
+def request_refresh(series_id: int) -> bool:
+    """Ask for a Sonarr refresh of ``series_id``.
+
+    Requests for a series that is already pending, running, or was refreshed
+    within ``aging_queue.refresh_cooldown`` seconds are collapsed into that
+    refresh. Returns True if a new refresh was scheduled.
+    """
+    with refresh_condition:
+        if series_id in refresh_pending or series_id in refresh_inflight:
+            return False
+
+        _last = refresh_last.get(series_id)
+        if (
+            _last is not None
+            and time.monotonic() - _last < config.data.aging_queue.refresh_cooldown
+        ):
+            return False
+
+        refresh_pending[series_id] = None
+        refresh_condition.notify()
+
+    return True
+
+
+def can_issue(now: float) -> bool:
+    """Whether the concurrency and hourly budgets allow another command.
+
+    Caller must hold ``refresh_condition``.
+    """
+    while refresh_issued and now - refresh_issued[0] >= 3600:
+        refresh_issued.popleft()
+
+    return (
+        len(refresh_inflight) < max(1, config.data.aging_queue.refresh_max_concurrent)
+        and len(refresh_issued) < max(1, config.data.aging_queue.refresh_per_hour)
+    )
+
+
+def issue_refreshes() -> None:
+    from sonarr_cache import refresh_series
+
+    _series_ids = []
+    with refresh_condition:
+        _now = time.monotonic()
+        while refresh_pending and can_issue(_now):
+            _series_id, _ = refresh_pending.popitem(last=False)
+            refresh_inflight[_series_id] = None
+            refresh_last[_series_id] = _now
+            refresh_issued.append(_now)
+            _series_ids.append(_series_id)
+
+    for _series_id in _series_ids:
+        try:
+            _command_id = refresh_series(_series_id).get("id")
+            if _command_id is None:
+                # Nothing to poll, so it would hold its slot forever.
+                raise ValueError("Sonarr returned no command ID")
+        except Exception as e:
+            _log.msg(f"Refresh of series {_series_id} failed to start: {e}")
+            with refresh_condition:
+                refresh_inflight.pop(_series_id, None)
+            continue
+
+        _log.msg(f"Requested Sonarr refresh of series {_series_id}.")
+        with refresh_condition:
+            refresh_inflight[_series_id] = _command_id
+
+
+def poll_refreshes() -> None:
+    from aging_queue_manager import wake_series
+    from pyarr.exceptions import PyarrResourceNotFound
+    from sonarr_cache import get_sonarr, invalidate_series
+
+    with refresh_condition:
+        _running = [
+            (_series_id, _command_id)
+            for _series_id, _command_id in refresh_inflight.items()
+            if _command_id is not None
+        ]
+
+    for _series_id, _command_id in _running:
+        try:
+            _status = get_sonarr().get_command(_command_id).get("status", "")
+        except PyarrResourceNotFound:
+            _status = "orphaned"
+        except Exception as e:
+            _log.msg(f"Could not poll refresh of series {_series_id}: {e}")
+            continue
+
+        if _status not in FINISHED_STATUSES:
+            continue
+
+        with refresh_condition:
+            refresh_inflight.pop(_series_id, None)
+
+        invalidate_series(_series_id)
+        _woken = wake_series(_series_id)
+        _log.msg(
+            f"Sonarr refresh of series {_series_id} {_status};"
+            f" rechecking {_woken} aging items."
+        )
+
+
+def refresh_stats() -> dict[str, int]:
+    with refresh_condition:
+        can_issue(time.monotonic())
+        return {
+            "pending": len(refresh_pending),
+            "running": len(refresh_inflight),
+            "issued_last_hour": len(refresh_issued),
+        }
+
+
+def process_refreshes(stop_event: threading.Event):
+    while not stop_event.is_set():
+        issue_refreshes()
+        poll_refreshes()
+
+        with refresh_condition:
+            if refresh_pending or refresh_inflight:
+                _timeout = config.data.aging_queue.refresh_poll
+            else:
+                _timeout = config.data.aging_queue.interval * 60
+            refresh_condition.wait(timeout=_timeout)
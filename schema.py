@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional
 
 
@@ -7,6 +7,11 @@ class ServarrConfig:
     in_path: str
     api: str
     url: str = "http://localhost:8989"
+    pool_size: int = 16
+    connect_timeout: float = 5
+    read_timeout: float = 60
+    max_concurrent: int = 4
+    requests_per_second: float = 10
 
 
 @dataclass
@@ -15,6 +20,10 @@ class WAIConfig:
     temp_path: str
     data_dir: str = "./data"
     conf_dir: str = "./conf"
+    queue_store_file: str = "wai_queue.db"
+    queue_commit_window_ms: int = 20
+    history_segment_mb: int = 64
+    affinity_file: str = "creator_affinity.json"
 
 
 @dataclass
@@ -23,18 +32,31 @@ class BaseQueueConfig:
     interval: int = 10
     flip_flop: Optional[bool] = False
     run: bool = True
+    wake_debounce_ms: int = 0
 
 
 @dataclass
 class AgingQueueConfig(BaseQueueConfig):
     file: str = "aging_queue.json"
     ripeness_per_day: int = 4
+    refresh_cooldown: int = 600
+    refresh_max_concurrent: int = 2
+    refresh_per_hour: int = 60
+    refresh_poll: int = 5
 
 
 @dataclass
 class DownloadQueueConfig(BaseQueueConfig):
     file: str = "download_queue.json"
     interval: int = 30
+    download_threads: int = 4
+    per_host_threads: int = 1
+
+
+@dataclass
+class PostprocessQueueConfig(BaseQueueConfig):
+    file: str = "postprocess_queue.json"
+    postprocess_threads: int = 2
 
 
 @dataclass
@@ -42,6 +64,14 @@ class DecisionQueueConfig(BaseQueueConfig):
     file: str = "decision_queue.json"
     matcher_threads: int = 8
     cache_ttl: int = 5
+    cache_size: int = 4096
+    title_shortlist: int = 0
+    air_window_hours: int = 72
+    calendar_window: bool = True
+    batch_size: int = 1
+    negative_cache: bool = True
+    negative_cache_misses: int = 3
+    affinity_min_score: int = 70
     overwrite_eps: bool = False
     honor_unmon_eps: bool = True
     honor_unmon_series: bool = True
@@ -91,3 +121,6 @@ class WAIConfigRoot:
     ytdlp: YtdlpConfig
     debug: Optional[DebugConfig] = None
     radarr: Optional[ServarrConfig] = None
+    postprocess_queue: PostprocessQueueConfig = field(
+        default_factory=PostprocessQueueConfig
+    )
@@ -2,7 +2,7 @@
 
 import fauxlogger as _log
 import thread_manager
-from fastapi import FastAPI, Query, Request
+from fastapi import FastAPI, HTTPException, Query, Request
 
 fastapi = FastAPI()
 
@@ -39,22 +39,23 @@ def handle_remove(from_file: str, item: str):
 
 
 @fastapi.post("/api/notify")
-async def api_notify(
+def api_notify(
     creator: str = Query(...),
     title: str = Query(...),
     datecode: str = Query(...),
     url: str = Query(...),
+    durable: bool = Query(False),
 ):
     from decision_queue_manager import enqueue as enqueue_decision
-
-    enqueue_decision(
-        {
-            "creator": creator.strip(),
-            "title": title.strip(),
-            "datecode": datecode.strip(),
-            "url": url.strip(),
-        }
-    )
+    from processor import new_item
+
+    try:
+        enqueue_decision(new_item(creator, title, datecode, url), durable)
+    except Exception as e:
+        if not durable:
+            raise
+        _log.msg(f"Durable enqueue failed: {e}")
+        raise HTTPException(status_code=503, detail="Item was not stored.")
     return {"status": "queued"}
 
 
@@ -73,6 +74,11 @@ async def api_stop_dlqm():
     thread_manager.stop_download_queue_manager()
 
 
+@fastapi.post("/api/stop_postprocess_manager")
+async def api_stop_ppqm():
+    thread_manager.stop_postprocess_queue_manager()
+
+
 @fastapi.post("/api/start_decision_manager")
 async def api_start_dqm():
     thread_manager.start_decision_queue_manager()
@@ -88,6 +94,11 @@ async def api_start_dlqm():
     thread_manager.start_download_queue_manager()
 
 
+@fastapi.post("/api/start_postprocess_manager")
+async def api_start_ppqm():
+    thread_manager.start_postprocess_queue_manager()
+
+
 @fastapi.post("/enqueue")
 async def enqueue(request: Request):
     from decision_queue_manager import enqueue as enqueue_decision
@@ -109,6 +120,21 @@ async def enqueue(request: Request):
     return {"status": "queued"}
 
 
+@fastapi.post("/api/sonarr_webhook")
+async def api_sonarr_webhook(request: Request):
+    from sonarr_cache import handle_sonarr_event
+
+    # Sonarr retries failed deliveries, so even bad payloads get a 2xx.
+    try:
+        payload = await request.json()
+    except ValueError:
+        return {"error": "Invalid JSON"}
+    if not isinstance(payload, dict) or not payload.get("eventType"):
+        return {"error": "Missing 'eventType' field"}
+
+    return handle_sonarr_event(payload)
+
+
 @fastapi.get("/get_item")
 async def get_item(datafrom: str, name: str | None = None, value: str | None = None):
     from processor import get_json_items_filtered
@@ -123,5 +149,6 @@ async def dequeue_item(request: Request):
 
     from decision_queue_manager import dequeue as dequeue_decision
 
+    # Accepts a bare item ID or any item dict carrying its "id".
     result = dequeue_decision(item)
     return result
@@ -0,0 +1,745 @@
+# sonarr_cache.py
+
+import os
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from functools import cached_property
+from typing import Any, Callable, Hashable
+
+import fauxlogger as _log
+from config import Config
+from episode_table import EpisodeRow, EpisodeTable
+from requests.adapters import HTTPAdapter
+from schema import WAIConfigRoot
+
+CONFIG_FILE: str = os.getenv("WAI_CONFIG_FILE", "./conf/wai.toml")
+config: Config[WAIConfigRoot] = Config(
+    schema=WAIConfigRoot, path=CONFIG_FILE, env_prefix="WAI_"
+)
+
+
+class MetadataCache:
+    """Size-bounded LRU cache with a per-entry TTL and hit/miss counters.
+
+    Each key also has a version that changes whenever its value may have: on
+    invalidation, and on a reload that returns something different.
+
+    Loads are single-flight: callers missing on a key that is already being
+    loaded wait for that load instead of starting their own.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = max(1, maxsize)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._loading: dict[Hashable, Future] = {}
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._versions: dict[Hashable, int] = {}
+        self._version_seq = itertools.count(1)
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+
+        with self._lock:
+            _entry = self._entries.get(key)
+            if _entry and _entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _entry[1]
+
+            _loading = self._loading.get(key)
+            _leader = _loading is None
+            if _leader:
+                self.misses += 1
+                _loading = self._loading[key] = Future()
+                _version = self._versions.get(key)
+            else:
+                self.coalesced += 1
+
+        if not _leader:
+            # Another caller is already loading this key; share its result.
+            return _loading.result()
+
+        try:
+            _value = loader()
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            _loading.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._loading[key]
+            if self._versions.get(key) == _version:
+                _previous = self._entries.get(key)
+                if _previous is not None and _previous[1] == _value:
+                    # Unchanged: keep the old object so anything derived from it stays.
+                    _value = _previous[1]
+                else:
+                    self._versions[key] = next(self._version_seq)
+                self._entries[key] = (time.monotonic() + self.ttl, _value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            # Otherwise it was invalidated mid-load; hand out the value uncached.
+
+        _loading.set_result(_value)
+
+        return _value
+
+    def invalidate(self, match: Callable[[Hashable], bool] | None = None) -> int:
+        """Drop every entry whose key satisfies ``match`` (all entries if None)."""
+        with self._lock:
+            _keys = [_key for _key in self._entries if match is None or match(_key)]
+            for _key in _keys:
+                del self._entries[_key]
+                self._versions[_key] = next(self._version_seq)
+            # Loads still running were started before this; don't let them store.
+            for _key in self._loading:
+                if _key not in _keys and (match is None or match(_key)):
+                    self._versions[_key] = next(self._version_seq)
+
+        return len(_keys)
+
+    def version(self, key: Hashable) -> int:
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    def is_fresh(self, key: Hashable) -> bool:
+        """Whether ``key`` is cached and not yet past its TTL."""
+        with self._lock:
+            _entry = self._entries.get(key)
+            return _entry is not None and _entry[0] > time.monotonic()
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            _lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "coalesced": self.coalesced,
+                "hit_rate": round(self.hits / _lookups, 3) if _lookups else 0.0,
+            }
+
+
+sonarr_cache = MetadataCache(
+    config.data.decision_queue.cache_size, config.data.decision_queue.cache_ttl
+)
+sonarr_client = None
+sonarr_client_lock = threading.Lock()
+series_derived: dict[str, tuple[list[dict], Any]] = {}
+series_derived_lock = threading.Lock()
+creator_series: dict[str, list[int]] | None = None
+creator_series_version = 0
+# The last map built; unlike creator_series it survives invalidation.
+creator_series_built: dict[str, list[int]] | None = None
+creator_series_expires = 0.0
+# Bumped by invalidate_tags(); a fetch started before that doesn't store.
+creator_series_generation = 0
+# The fetch in flight, shared by every caller that needs the map meanwhile.
+creator_series_loading: Future | None = None
+creator_series_lock = threading.Lock()
+# Per-thread pins of an active sonarr_snapshot(): key -> (version, value).
+snapshot_local = threading.local()
+
+
+class RequestGate:
+    """Caps concurrent outbound requests and spaces them to a rate.
+
+    ``rate`` is requests per second; 0 leaves the rate unlimited. Time spent
+    waiting for a slot is recorded as queueing delay.
+    """
+
+    def __init__(self, max_concurrent: int, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.in_flight = 0
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrent))
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def __enter__(self):
+        _start = time.monotonic()
+        self._slots.acquire()
+
+        if self.interval:
+            with self._lock:
+                _now = time.monotonic()
+                _slot = max(_now, self._next_slot)
+                self._next_slot = _slot + self.interval
+            if _slot > _now:
+                time.sleep(_slot - _now)
+
+        _waited = time.monotonic() - _start
+        with self._lock:
+            self.waits += 1
+            self.wait_total += _waited
+            self.wait_max = max(self.wait_max, _waited)
+            self.in_flight += 1
+
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self) -> dict[str, int | float]:
+        with self._lock:
+            return {
+                "in_flight": self.in_flight,
+                "queue_wait_avg_ms": (
+                    round(self.wait_total / self.waits * 1000, 1) if self.waits else 0.0
+                ),
+                "queue_wait_max_ms": round(self.wait_max * 1000, 1),
+            }
+
+
+class PooledAdapter(HTTPAdapter):
+    """Keep-alive connection pool with default timeouts and request counting.
+
+    Every request passes through ``gate``, if given, before it is sent.
+    """
+
+    def __init__(
+        self,
+        pool_size: int,
+        timeout: tuple[float, float],
+        gate: RequestGate | None = None,
+    ):
+        self.timeout = timeout
+        self.gate = gate
+        self.requests = 0
+        self._count_lock = threading.Lock()
+        super().__init__(pool_connections=1, pool_maxsize=max(1, pool_size))
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        with self._count_lock:
+            self.requests += 1
+        if self.gate is None:
+            return super().send(request, **kwargs)
+        with self.gate:
+            return super().send(request, **kwargs)
+
+    def stats(self) -> dict[str, int | float]:
+        _pools = [
+            self.poolmanager.pools[_key] for _key in self.poolmanager.pools.keys()
+        ]
+        _opened = sum(_pool.num_connections for _pool in _pools)
+        _stats = {
+            "requests": self.requests,
+            "connections_opened": _opened,
+            "connections_reused": max(0, self.requests - _opened),
+            "pool_size": self._pool_maxsize,
+        }
+        if self.gate is not None:
+            _stats.update(self.gate.stats())
+        return _stats
+
+
+sonarr_adapter: PooledAdapter | None = None
+
+
+def get_sonarr():
+    """The process-wide Sonarr API client, on one pooled keep-alive session."""
+    global sonarr_client, sonarr_adapter
+
+    with sonarr_client_lock:
+        if sonarr_client is None:
+            from pyarr import SonarrAPI
+
+            sonarr_adapter = PooledAdapter(
+                config.data.sonarr.pool_size,
+                (config.data.sonarr.connect_timeout, config.data.sonarr.read_timeout),
+                RequestGate(
+                    config.data.sonarr.max_concurrent,
+                    config.data.sonarr.requests_per_second,
+                ),
+            )
+            sonarr_client = SonarrAPI(config.data.sonarr.url, config.data.sonarr.api)
+            sonarr_client.session.mount("http://", sonarr_adapter)
+            sonarr_client.session.mount("https://", sonarr_adapter)
+
+    return sonarr_client
+
+
+def client_stats() -> dict[str, int | float]:
+    return sonarr_adapter.stats() if sonarr_adapter else {}
+
+
+def refresh_series(series_id: int) -> dict:
+    """Ask Sonarr to rescan one series; returns the queued command."""
+    return get_sonarr().post_command("RefreshSeries", seriesId=series_id)
+
+
+@contextmanager
+def sonarr_snapshot():
+    """Pin the Sonarr data this thread reads to what it first sees, until exit.
+
+    Everything decided inside one snapshot sees a single series list, tag map
+    and set of episode tables, and their versions, even if the cache is
+    refreshed or invalidated meanwhile. Nested snapshots share the outer one.
+    """
+    if getattr(snapshot_local, "pins", None) is not None:
+        yield
+        return
+
+    snapshot_local.pins = {}
+    try:
+        yield
+    finally:
+        snapshot_local.pins = None
+
+
+def pinned(key: Hashable, version: Callable[[], int], loader: Callable[[], Any]) -> Any:
+    """``loader()``, or the value pinned for ``key`` in this thread's snapshot."""
+    _pins = getattr(snapshot_local, "pins", None)
+    if _pins is None:
+        return loader()
+
+    if key not in _pins:
+        # Read the version first: if the value changes in between, the pin
+        # is only ever older than its data, never newer.
+        _version = version()
+        _pins[key] = (_version, loader())
+
+    return _pins[key][1]
+
+
+def pinned_version(key: Hashable, version: Callable[[], int]) -> int:
+    _pins = getattr(snapshot_local, "pins", None)
+    if _pins is not None and key in _pins:
+        return _pins[key][0]
+
+    return version()
+
+
+def cached(key: Hashable, loader: Callable[[], Any]) -> Any:
+    return pinned(
+        key, lambda: sonarr_cache.version(key), lambda: sonarr_cache.get(key, loader)
+    )
+
+
+def cached_version(key: Hashable) -> int:
+    return pinned_version(key, lambda: sonarr_cache.version(key))
+
+
+def get_series() -> list[dict]:
+    return cached(("series",), lambda: get_sonarr().get_series())
+
+
+def derive_from_series(name: str, builder: Callable[[list[dict]], Any]) -> Any:
+    """``builder(series list)``, rebuilt only when the cached series list changes."""
+    _series = get_series()
+
+    with series_derived_lock:
+        _derived = series_derived.get(name)
+        if _derived and (_derived[0] is _series or _derived[0] == _series):
+            # A refetch that came back unchanged keeps the built value.
+            series_derived[name] = (_series, _derived[1])
+            return _derived[1]
+
+    _value = builder(_series)
+
+    with series_derived_lock:
+        series_derived[name] = (_series, _value)
+
+    return _value
+
+
+def get_series_by_id(series_id: int) -> dict:
+    _by_id = derive_from_series(
+        "series_by_id", lambda _series: {_s["id"]: _s for _s in _series}
+    )
+    return _by_id.get(series_id, {})
+
+
+class SeriesTitleIndex:
+    """Series titles, pre-processed for rapidfuzz on first use, with a token ->
+    series lookup.
+
+    ``candidates`` can narrow the library down to the titles worth handing to
+    ``match_to_show``: every series sharing a reasonably rare token with the
+    query, plus the best ``limit`` fuzzy matches. A ``limit`` of 0 (the
+    ``decision_queue.title_shortlist`` default) hands over the whole library,
+    so the matcher's decision is unchanged; pruning is opt-in.
+    """
+
+    def __init__(self, series: list[dict]):
+        self.titles: list[tuple[str, int]] = [(_s["title"], _s["id"]) for _s in series]
+
+    # Only shortlisting reads these, so they're built on first use rather than
+    # on every series list change.
+    @cached_property
+    def processed(self) -> list[str]:
+        from rapidfuzz.utils import default_process
+
+        return [default_process(_t) for _t, _ in self.titles]
+
+    @cached_property
+    def tokens(self) -> dict[str, set[int]]:
+        _tokens: dict[str, set[int]] = {}
+        for _pos, _processed in enumerate(self.processed):
+            for _token in _processed.split():
+                _tokens.setdefault(_token, set()).add(_pos)
+
+        return _tokens
+
+    def _token_hits(self, query: str, limit: int) -> set[int]:
+        _hits: set[int] = set()
+        for _token in set(query.split()):
+            _postings = self.tokens.get(_token)
+            if _postings and len(_postings) <= limit:
+                _hits |= _postings
+
+        return _hits
+
+    def candidates(self, query: str, limit: int) -> list[tuple[str, int]]:
+        from rapidfuzz import fuzz, process
+        from rapidfuzz.utils import default_process
+
+        if limit <= 0 or len(self.titles) <= limit:
+            return self.titles
+
+        _query = default_process(query)
+        _hits = self._token_hits(_query, limit)
+
+        for _, _, _pos in process.extract(
+            _query,
+            self.processed,
+            scorer=fuzz.partial_token_set_ratio,
+            processor=None,
+            limit=limit,
+        ):
+            _hits.add(_pos)
+
+        return [self.titles[_pos] for _pos in sorted(_hits)]
+
+    def candidates_many(
+        self, queries: list[str], limit: int
+    ) -> list[list[tuple[str, int]]]:
+        """``candidates`` for many queries, scored as one rapidfuzz matrix."""
+        import numpy as np
+        from rapidfuzz import fuzz, process
+        from rapidfuzz.utils import default_process
+
+        if limit <= 0 or len(self.titles) <= limit:
+            return [self.titles for _ in queries]
+
+        _queries = [default_process(_q) for _q in queries]
+        _scores = process.cdist(
+            _queries,
+            self.processed,
+            scorer=fuzz.partial_token_set_ratio,
+            processor=None,
+            dtype=np.uint8,
+            workers=-1,
+        )
+        _best = np.argpartition(_scores, -limit, axis=1)[:, -limit:]
+
+        _results = []
+        for _row, _query in enumerate(_queries):
+            _hits = self._token_hits(_query, limit)
+            _hits.update(_best[_row].tolist())
+            _results.append([self.titles[_pos] for _pos in sorted(_hits)])
+
+        return _results
+
+
+def get_series_index() -> SeriesTitleIndex:
+    return derive_from_series("series_index", SeriesTitleIndex)
+
+
+def build_creator_series() -> dict[str, list[int]]:
+    """``creator -> seriesIds`` for every ``wai-<creator>`` tag, in one request."""
+    return {
+        _tag["label"].lower().removeprefix("wai-"): list(_tag.get("seriesIds", []))
+        for _tag in get_sonarr().get_tag_detail()
+        if _tag.get("label", "").lower().startswith("wai-")
+    }
+
+
+def refresh_creator_series(loading: Future, generation: int) -> None:
+    """Fetch the creator map for ``loading``'s waiters.
+
+    The map is only kept if ``invalidate_tags`` wasn't called since
+    ``generation``; otherwise it may predate the change.
+    """
+    global creator_series, creator_series_expires, creator_series_loading
+    global creator_series_built, creator_series_version
+
+    try:
+        _map = build_creator_series()
+    except Exception as e:
+        _log.msg(f"Failed to refresh creator tags from Sonarr: {e}")
+        with creator_series_lock:
+            if creator_series_loading is loading:
+                creator_series_loading = None
+        loading.set_exception(e)
+        return
+
+    with creator_series_lock:
+        if creator_series_loading is loading:
+            creator_series_loading = None
+        if generation == creator_series_generation:
+            if _map != creator_series_built:
+                creator_series_version += 1
+            creator_series = creator_series_built = _map
+            creator_series_expires = time.monotonic() + sonarr_cache.ttl
+
+    loading.set_result(_map)
+
+
+def get_creator_series(creator: str) -> list[int]:
+    """Series tagged ``wai-<creator>``.
+
+    Once expired, the current map keeps answering while a background thread
+    fetches the next one; after ``invalidate_tags`` the next caller rebuilds it
+    and any others wait for that one fetch.
+    """
+    _map = pinned(
+        ("creator_series",), lambda: creator_series_version, current_creator_series
+    )
+
+    return _map.get(creator.lower(), [])
+
+
+def current_creator_series() -> dict[str, list[int]]:
+    global creator_series_loading
+
+    _leader = False
+    with creator_series_lock:
+        _map = creator_series
+        _loading = creator_series_loading
+        _generation = creator_series_generation
+        if _loading is None and (
+            _map is None or time.monotonic() >= creator_series_expires
+        ):
+            _loading = creator_series_loading = Future()
+            _leader = True
+
+    if _leader and _map is not None:
+        threading.Thread(
+            target=refresh_creator_series,
+            args=(_loading, _generation),
+            daemon=True,
+            name="creator_tags",
+        ).start()
+    elif _leader:
+        refresh_creator_series(_loading, _generation)
+
+    if _map is None:
+        _map = _loading.result()
+
+    return _map
+
+
+def get_episode_table(series_id: int) -> EpisodeTable:
+    return cached(
+        ("episodes", series_id),
+        lambda: EpisodeTable(
+            series_id,
+            get_series_by_id(series_id).get("title", ""),
+            get_sonarr().get_episode(series_id, True),
+        ),
+    )
+
+
+def datecode_timestamp(datecode) -> int | None:
+    """Epoch seconds of an item's ``datecode``, read as UTC like the matcher does."""
+    from datetime import timezone
+
+    from util import parse_date
+
+    if not isinstance(datecode, str) or not datecode:
+        return None
+
+    _parsed = parse_date(datecode)
+    if _parsed is None:
+        return None
+
+    return int(_parsed.replace(tzinfo=timezone.utc).timestamp())
+
+
+def get_calendar_tables(timestamp: int) -> tuple[tuple, dict[int, EpisodeTable]]:
+    """Episode tables, per series, for the air-date window around ``timestamp``.
+
+    Fetched with one calendar request covering whole days, so every item
+    with a datecode on the same days shares it. Returns the cache key too.
+    """
+    from datetime import datetime, timedelta, timezone
+
+    _window = config.data.decision_queue.air_window_hours * 3600
+    _start = datetime.fromtimestamp(timestamp - _window, timezone.utc).date()
+    _end = datetime.fromtimestamp(timestamp + _window, timezone.utc).date()
+    _end += timedelta(days=1)
+    _key = ("calendar", _start.isoformat(), _end.isoformat())
+
+    def _load() -> dict[int, EpisodeTable]:
+        _by_series: dict[int, list[dict]] = {}
+        for _ep in get_sonarr().get_calendar(_start, _end, unmonitored=True):
+            _by_series.setdefault(_ep["seriesId"], []).append(_ep)
+
+        return {
+            _series_id: EpisodeTable(
+                _series_id, get_series_by_id(_series_id).get("title", ""), _episodes
+            )
+            for _series_id, _episodes in _by_series.items()
+        }
+
+    return _key, cached(_key, _load)
+
+
+def episode_source(series_id: int, datecode=None) -> tuple[tuple, EpisodeTable]:
+    """Cache key and episode table that ``series_id``'s candidates come from.
+
+    With ``decision_queue.calendar_window`` and a usable ``datecode`` this is
+    the calendar window around it, as long as the series has episodes there;
+    otherwise the series' full episode list.
+    """
+    _timestamp = datecode_timestamp(datecode)
+    _window = config.data.decision_queue.air_window_hours * 3600
+
+    if (
+        config.data.decision_queue.calendar_window
+        and _window > 0
+        and _timestamp is not None
+    ):
+        _key, _tables = get_calendar_tables(_timestamp)
+        _table = _tables.get(series_id)
+        if _table is not None and _table.rows_near(
+            _timestamp, _window, None, config.data.decision_queue.honor_unmon_eps
+        ):
+            return _key, _table
+
+    return ("episodes", series_id), get_episode_table(series_id)
+
+
+def get_episode_data(
+    series_id: int,
+    tags: dict[str, list[int]] | None = None,
+    datecode=None,
+    table: EpisodeTable | None = None,
+) -> list[EpisodeRow]:
+    """Candidate rows for ``match_to_episode`` from one series' episodes.
+
+    With a usable ``datecode``, only episodes aired within
+    ``decision_queue.air_window_hours`` of it are returned, unless none are.
+    Pass ``table`` to read from an already fetched episode table.
+    """
+    _tag = next(
+        (_key for _key, _value in (tags or {}).items() if series_id in _value),
+        None,
+    )
+    _table = table if table is not None else episode_source(series_id, datecode)[1]
+    _monitored_only = config.data.decision_queue.honor_unmon_eps
+    _window = config.data.decision_queue.air_window_hours * 3600
+    _timestamp = datecode_timestamp(datecode) if _window > 0 else None
+
+    if _timestamp is not None:
+        _rows = _table.rows_near(_timestamp, _window, _tag, _monitored_only)
+        if _rows:
+            return _rows
+
+    return _table.rows(_tag, _monitored_only)
+
+
+def series_version() -> tuple[int, int]:
+    """Versions of the series list and creator tag map, as already cached.
+
+    Never loads anything; a version only moves once its data is reloaded and
+    found changed, or invalidated.
+    """
+    return (
+        cached_version(("series",)),
+        pinned_version(("creator_series",), lambda: creator_series_version),
+    )
+
+
+def episode_versions(series_ids: list[int], datecode=None) -> dict[tuple, int]:
+    """Cache key -> version of the episode data ``series_ids`` match against."""
+    _keys = {episode_source(_series_id, datecode)[0] for _series_id in series_ids}
+
+    return {_key: cached_version(_key) for _key in _keys}
+
+
+def invalidate_series(series_id: int | None = None) -> int:
+    """Forget cached data for one series (and the series list), or everything."""
+    if series_id is None:
+        with series_derived_lock:
+            series_derived.clear()
+        invalidate_tags()
+        return sonarr_cache.invalidate()
+
+    return sonarr_cache.invalidate(
+        lambda _key: _key[0] in ("series", "calendar")
+        or (_key[0] == "episodes" and _key[1] == series_id)
+    )
+
+
+def invalidate_episodes(series_id: int) -> int:
+    """Forget one series' episodes and any calendar windows, not the series list."""
+    return sonarr_cache.invalidate(
+        lambda _key: _key[0] == "calendar"
+        or (_key[0] == "episodes" and _key[1] == series_id)
+    )
+
+
+def invalidate_tags() -> None:
+    global creator_series, creator_series_generation, creator_series_loading
+
+    with creator_series_lock:
+        creator_series = None
+        creator_series_generation += 1
+        # A fetch already running may predate the change; start a new one.
+        creator_series_loading = None
+
+
+def handle_sonarr_event(payload: dict) -> dict:
+    """Invalidate what a Sonarr Connect (webhook) event says has changed."""
+    _event = str(payload.get("eventType", ""))
+    _series = payload.get("series")
+    _series_id = _series.get("id") if isinstance(_series, dict) else None
+
+    match _event:
+        case "Test" | "Health" | "HealthRestored" | "ApplicationUpdate":
+            return {"event": _event, "invalidated": 0}
+        case "SeriesAdd" | "SeriesDelete":
+            # Membership of the series list and of its tags changed.
+            invalidate_tags()
+            _dropped = sonarr_cache.invalidate(
+                lambda _key: _key[0] in ("series", "calendar")
+                or (_key[0] == "episodes" and _key[1] == _series_id)
+            )
+        case _ if _series_id is not None:
+            # Download (episode file import), Rename, EpisodeFileDelete, Grab...
+            _dropped = invalidate_episodes(_series_id)
+        case _:
+            _dropped = invalidate_series()
+
+    _log.msg(
+        f"Sonarr event {_event} (series {_series_id}): dropped {_dropped} cache entries."
+    )
+
+    return {"event": _event, "series_id": _series_id, "invalidated": _dropped}
+
+
+def cache_stats() -> dict[str, int | float]:
+    return sonarr_cache.stats()
@@ -18,7 +18,10 @@ from manual_intervention_manager import (drop_mi_queue_item, get_mi_queue,
 from manual_intervention_manager import \
     remove_notify_listener as remove_mi_notify
 from manual_intervention_manager import save_mi_queue, set_mi_queue_item
+from match_memo import memo_stats
+from refresh_scheduler import refresh_stats
 from schema import WAIConfigRoot
+from sonarr_cache import cache_stats, client_stats, invalidate_series
 # from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from telegram import Update
 from telegram.ext import (Application, CommandHandler, ContextTypes,
@@ -623,6 +626,8 @@ async def _set(
                     f"Updated '{_parameter}[{_subparameter}]' to '{_value}' from '{_old}'"
                 )
 
+        # Hand-edited items must be matched afresh, not from the match memo.
+        _item["match_override"] = True
         set_mi_queue_item(_target_uuid.lower(), _item)
 
         await update.effective_message.reply_text(
@@ -720,6 +725,33 @@ async def _queue_saveload(
                 raise UsageError
 
 
+@register_command(
+    ["cache", "clearcache"],
+    help_text=[
+        "Show Sonarr metadata cache and connection statistics.",
+        "Drop everything from the Sonarr metadata cache.",
+    ],
+)
+async def _cache(update: Update, context: ContextTypes.DEFAULT_TYPE, called_as: str):
+    if update.effective_message:
+        match called_as:
+            case "cache":
+                _stats = (
+                    cache_stats() | client_stats() | memo_stats() | refresh_stats()
+                )
+                await update.effective_message.reply_text(
+                    "Sonarr metadata cache and connections:\n"
+                    + "\n".join(f"{_key}: {_value}" for _key, _value in _stats.items())
+                )
+            case "clearcache":
+                _dropped = invalidate_series()
+                await update.effective_message.reply_text(
+                    f"Sonarr metadata cache cleared ({_dropped} entries)."
+                )
+            case _:
+                raise UsageError
+
+
 @register_command("help", help_text="Command list with short descriptions.")
 async def _help(
     update: Update, context: ContextTypes.DEFAULT_TYPE, called_as: str, _arg: str
@@ -0,0 +1,95 @@
+# conftest.py
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Modules read the config at import time, so point them at a throwaway one
+# before any test imports them.
+_root = tempfile.mkdtemp(prefix="wai-tests-")
+_config_file = os.path.join(_root, "wai.toml")
+with open(_config_file, "w") as f:
+    f.write(
+        f"""
+[wai]
+output_path = "{_root}/out"
+temp_path = ""
+data_dir = "{_root}/data"
+
+[sonarr]
+in_path = "{_root}/in"
+api = "test"
+
+[aging_queue]
+[download_queue]
+[decision_queue]
+[manual_intervention]
+
+[telegram]
+token = "test"
+chat_id = 0
+
+[ytdlp]
+"""
+    )
+
+os.environ["WAI_CONFIG_FILE"] = _config_file
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeSonarr:
+    """Just enough of pyarr's SonarrAPI for sonarr_cache, counting requests."""
+
+    def __init__(self):
+        self.series = [{"id": 1, "title": "Alpha Show"}]
+        self.episodes = {1: [episode(11, "Pilot")]}
+        self.tags = [{"label": "wai-alpha", "seriesIds": [1]}]
+        self.requests = 0
+
+    def get_series(self):
+        self.requests += 1
+        return [dict(_s) for _s in self.series]
+
+    def get_episode(self, series_id, series=False):
+        self.requests += 1
+        return [dict(_ep) for _ep in self.episodes.get(series_id, [])]
+
+    def get_tag_detail(self):
+        self.requests += 1
+        return [dict(_tag) for _tag in self.tags]
+
+    def get_calendar(self, start_date, end_date, unmonitored=True):
+        self.requests += 1
+        return [
+            dict(_ep, seriesId=_series_id)
+            for _series_id, _episodes in self.episodes.items()
+            for _ep in _episodes
+        ]
+
+
+def episode(episode_id: int, title: str) -> dict:
+    return {
+        "id": episode_id,
+        "seasonNumber": 1,
+        "episodeNumber": episode_id,
+        "title": title,
+        "hasFile": False,
+        "monitored": True,
+        "airDate": "2024-01-01",
+        "airDateUtc": "2024-01-01T00:00:00Z",
+    }
+
+
+@pytest.fixture
+def sonarr(monkeypatch):
+    import sonarr_cache
+
+    _fake = FakeSonarr()
+    monkeypatch.setattr(sonarr_cache, "sonarr_client", _fake)
+    sonarr_cache.invalidate_series()
+
+    yield _fake
+
+    sonarr_cache.invalidate_series()
@@ -0,0 +1,70 @@
+# test_download_queue_manager.py
+
+import random
+
+
+def item(item_id: int, host: str) -> dict:
+    return {"id": str(item_id), "url": f"https://www.{host}/watch/{item_id}"}
+
+
+def first_eligible(model: list[dict], eligible) -> dict | None:
+    """What HostQueues.first_eligible must return, by scanning the whole queue."""
+    from download_queue_manager import url_host
+
+    return next((_item for _item in model if eligible(url_host(_item))), None)
+
+
+def test_host_queues_keep_queue_order_across_hosts_and_reversal():
+    from download_queue_manager import HostQueues
+
+    _queues = HostQueues([item(1, "a.com"), item(2, "b.com"), item(3, "a.com")])
+
+    assert _queues.first_eligible(lambda _host: True)["id"] == "1"
+    assert _queues.first_eligible(lambda _host: _host != "a.com")["id"] == "2"
+
+    # Reversed, the newest item leads; items appended later go to the back.
+    _queues.reverse()
+    _queues.append(item(4, "b.com"))
+    assert _queues.first_eligible(lambda _host: True)["id"] == "3"
+    assert _queues.first_eligible(lambda _host: _host == "b.com")["id"] == "2"
+
+    # Back in order, that later item now leads: the queue is 4, 1, 2.
+    _queues.remove(item(3, "a.com"))
+    _queues.reverse()
+    assert _queues.first_eligible(lambda _host: True)["id"] == "4"
+    assert _queues.first_eligible(lambda _host: _host == "a.com")["id"] == "1"
+
+
+def test_host_queues_match_a_full_scan():
+    from download_queue_manager import HostQueues
+
+    _random = random.Random(8)
+    _hosts = ["a.com", "b.com", "c.com", "d.com"]
+
+    for _ in range(50):
+        _queues = HostQueues()
+        _model: list[dict] = []
+        _next_id = 0
+
+        for _ in range(200):
+            _action = _random.random()
+            if _action < 0.5 or not _model:
+                _item = item(_next_id, _random.choice(_hosts))
+                _next_id += 1
+                _queues.append(_item)
+                _model.append(_item)
+            elif _action < 0.8:
+                _blocked = set(_random.sample(_hosts, _random.randint(0, 3)))
+                _expected = first_eligible(_model, lambda _h: _h not in _blocked)
+                _picked = _queues.first_eligible(lambda _h: _h not in _blocked)
+                assert _picked is _expected
+                if _picked is not None:
+                    _queues.remove(_picked)
+                    _model.remove(_picked)
+            elif _action < 0.9:
+                _item = _random.choice(_model)
+                _queues.remove(_item)
+                _model.remove(_item)
+            else:
+                _queues.reverse()
+                _model.reverse()
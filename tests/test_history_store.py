@@ -0,0 +1,56 @@
+# test_history_store.py
+
+import json
+import os
+
+import pytest
+
+LEGACY = [
+    {"id": "old-1", "url": "https://example.com/1", "creator": "Alpha"},
+    {"id": "old-2", "url": "https://example.com/2", "creator": "Beta"},
+]
+NEW = {"id": "new-1", "url": "https://example.com/3", "creator": "Alpha"}
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    import history_store
+
+    with open(tmp_path / "pass.json", "w") as f:
+        json.dump(LEGACY, f)
+
+    _history = history_store.HistoryStore(str(tmp_path), 1024 * 1024)
+    # Entries indexed before the legacy file was imported.
+    _history.record(NEW, "pass.json")
+    history_store.migrate_legacy_history(_history)
+    monkeypatch.setattr(history_store, "history", _history)
+
+    yield _history
+
+    _history.close()
+
+
+def test_legacy_entries_are_read_ahead_of_new_ones(history, tmp_path):
+    assert history.read("pass.json") == LEGACY + [NEW]
+    assert history.read("pass.json", "creator", "alpha") == [LEGACY[0], NEW]
+    assert not os.path.exists(tmp_path / "pass.json")
+    assert os.path.exists(tmp_path / "pass.json.migrated")
+
+
+def test_legacy_file_is_imported_once(history, tmp_path):
+    import history_store
+
+    os.replace(tmp_path / "pass.json.migrated", tmp_path / "pass.json")
+    history_store.migrate_legacy_history(history)
+
+    assert history.read("pass.json") == LEGACY + [NEW]
+
+
+def test_history_prefix_names_the_same_history(history):
+    from processor import get_json_items, get_json_items_filtered, remove_json_item
+
+    assert get_json_items("history/pass") == LEGACY + [NEW]
+    assert get_json_items_filtered("history/pass.json", "id", "old-2") == [LEGACY[1]]
+
+    assert remove_json_item("history/pass", {"id": "old-1"}) == {"removed": [LEGACY[0]]}
+    assert get_json_items("pass") == [LEGACY[1], NEW]
@@ -0,0 +1,93 @@
+# test_match_memo.py
+
+import time
+
+from conftest import episode
+
+
+def test_memo_hit_copies_results_and_loads_nothing(sonarr):
+    import sonarr_cache
+    from match_memo import lookup_match, remember_match
+
+    _item = {"title": "Pilot", "creator": "Alpha", "datecode": "20240101"}
+    _title_result = {"matched_id": 1, "matched_show": "Alpha Show"}
+    _episode_result = {"score": 90, "full_match": {"has_file": False}}
+
+    sonarr_cache.get_series()
+    sonarr_cache.get_creator_series("alpha")
+    sonarr_cache.episode_source(1, _item["datecode"])
+
+    with sonarr_cache.sonarr_snapshot():
+        remember_match(_item, _title_result, _episode_result, [1])
+
+    # The caller goes on to change its results; the memo must not follow.
+    _episode_result["full_match"]["has_file"] = True
+
+    _requests = sonarr.requests
+    _memo = lookup_match(_item)
+
+    assert _memo is not None
+    assert _memo.series_ids == [1]
+    assert _memo.episode_result["full_match"]["has_file"] is False
+    assert sonarr.requests == _requests
+
+    sonarr.episodes[1].append(episode(12, "Second"))
+    sonarr_cache.invalidate_series(1)
+
+    assert lookup_match(_item) is None
+    assert sonarr.requests == _requests
+
+
+def test_creator_is_rejected_after_consecutive_misses(sonarr):
+    import sonarr_cache
+    from match_memo import (
+        forget_unmatched_creator,
+        is_unmatched_creator,
+        remember_unmatched_creator,
+    )
+
+    sonarr_cache.get_series()
+    sonarr_cache.get_creator_series("alpha")
+    _requests = sonarr.requests
+
+    # One odd title isn't enough to block a creator.
+    remember_unmatched_creator("Vlogger")
+    assert not is_unmatched_creator("vlogger")
+    remember_unmatched_creator("Vlogger")
+    remember_unmatched_creator("Vlogger")
+    assert is_unmatched_creator("vlogger")
+    assert sonarr.requests == _requests
+
+    # A match in between restarts the count.
+    forget_unmatched_creator("Vlogger")
+    remember_unmatched_creator("Vlogger")
+    assert not is_unmatched_creator("vlogger")
+
+    remember_unmatched_creator("Vlogger")
+    remember_unmatched_creator("Vlogger")
+    sonarr.series.append({"id": 2, "title": "Vlogger Show"})
+    sonarr_cache.invalidate_series()
+
+    assert not is_unmatched_creator("vlogger")
+    assert sonarr.requests == _requests
+
+
+def test_memo_expires_with_its_sources(sonarr, monkeypatch):
+    import sonarr_cache
+    from match_memo import lookup_match, remember_match
+
+    _item = {"title": "Second", "creator": "Alpha", "datecode": "20240101"}
+
+    sonarr_cache.get_series()
+    sonarr_cache.get_creator_series("alpha")
+    sonarr_cache.episode_source(1, _item["datecode"])
+    remember_match(_item, {"matched_id": 1}, {"score": 10}, [1])
+
+    assert lookup_match(_item) is not None
+
+    # Sonarr gains the episode, but nothing reloads the cached window.
+    sonarr.episodes[1].append(episode(12, "Second"))
+    _now = time.monotonic() + sonarr_cache.sonarr_cache.ttl + 1
+    monkeypatch.setattr(sonarr_cache.time, "monotonic", lambda: _now)
+
+    assert lookup_match(_item) is None
@@ -0,0 +1,104 @@
+# test_queue_store.py
+
+import sqlite3
+import time
+
+import pytest
+
+
+class FailingCommit:
+    """Wraps the store's connection so every COMMIT fails."""
+
+    def __init__(self, db: sqlite3.Connection):
+        self.db = db
+
+    def execute(self, sql: str, *args):
+        if sql == "COMMIT":
+            raise sqlite3.OperationalError("disk I/O error")
+        return self.db.execute(sql, *args)
+
+    @property
+    def in_transaction(self) -> bool:
+        return self.db.in_transaction
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "queues.db")
+
+
+def test_failed_op_rolls_back_alone(store_path):
+    from queue_store import QueueStore
+
+    _store = QueueStore(store_path, commit_window_ms=50)
+
+    def _fails(db):
+        db.execute(
+            "INSERT INTO items (id, data, updated) VALUES ('partial', '{}', 0)"
+        )
+        raise ValueError("bad op")
+
+    _before = _store.put({"id": "a"}, "decision")
+    _failed = _store._submit(_fails)
+    _after = _store.put({"id": "b"}, "decision")
+
+    assert _before.result() is None
+    assert isinstance(_failed.exception(), ValueError)
+    assert _after.result() is None
+    assert [_item["id"] for _item in _store.load("decision")] == ["a", "b"]
+    with _store._lock:
+        assert not _store._db.execute(
+            "SELECT 1 FROM items WHERE id='partial'"
+        ).fetchone()
+
+    _store.close()
+
+
+def test_failed_commit_fails_every_waiter(store_path):
+    from queue_store import QueueStore
+
+    _store = QueueStore(store_path, commit_window_ms=50)
+    _db = _store._db
+    _store._db = FailingCommit(_db)
+
+    _futures = [_store.put({"id": _id}, "decision") for _id in "abc"]
+    for _future in _futures:
+        assert isinstance(_future.exception(), sqlite3.OperationalError)
+
+    # The writer survives, and nothing of the failed batch was stored.
+    _store._db = _db
+    assert _store.put({"id": "d"}, "decision").result() is None
+    assert [_item["id"] for _item in _store.load("decision")] == ["d"]
+
+    _store.close()
+
+
+def test_flush_skips_the_commit_window(store_path):
+    from queue_store import QueueStore
+
+    _store = QueueStore(store_path, commit_window_ms=10_000)
+
+    _started = time.monotonic()
+    _done = _store.put({"id": "a"}, "decision")
+    _store.flush()
+
+    assert _done.done()
+    assert time.monotonic() - _started < 5
+
+    _store.close()
+
+
+def test_close_drains_pending_writes(store_path):
+    from queue_store import QueueStore
+
+    _store = QueueStore(store_path, commit_window_ms=10_000)
+    _done = _store.move({"id": "a"}, "aging", "decision")
+    _store.close()
+
+    assert _done.result() is None
+    with pytest.raises(RuntimeError):
+        _store.put({"id": "b"}, "decision")
+
+    _reopened = QueueStore(store_path)
+    assert [_item["id"] for _item in _reopened.load("decision")] == ["a"]
+    _reopened.close()
@@ -0,0 +1,18 @@
+# test_refresh_scheduler.py
+
+from collections import deque
+
+
+def test_refresh_without_command_id_frees_its_slot(monkeypatch):
+    import refresh_scheduler
+    import sonarr_cache
+
+    monkeypatch.setattr(sonarr_cache, "refresh_series", lambda _series_id: {})
+    monkeypatch.setattr(refresh_scheduler, "refresh_last", {})
+    monkeypatch.setattr(refresh_scheduler, "refresh_issued", deque())
+
+    assert refresh_scheduler.request_refresh(7)
+    refresh_scheduler.issue_refreshes()
+
+    assert 7 not in refresh_scheduler.refresh_inflight
+    assert not refresh_scheduler.refresh_pending
@@ -0,0 +1,113 @@
+# test_sonarr_cache.py
+
+import time
+
+from conftest import episode
+
+
+def test_snapshot_pins_data_and_versions(sonarr):
+    import sonarr_cache
+
+    with sonarr_cache.sonarr_snapshot():
+        sonarr_cache.get_series()
+        sonarr_cache.get_creator_series("")
+        _table = sonarr_cache.get_episode_table(1)
+        _version = sonarr_cache.series_version()
+        _episode_versions = sonarr_cache.episode_versions([1])
+
+        # Sonarr changes and the cache is invalidated mid-batch.
+        sonarr.series.append({"id": 2, "title": "Beta Show"})
+        sonarr.episodes[1].append(episode(12, "Second"))
+        sonarr.tags.append({"label": "wai-beta", "seriesIds": [2]})
+        sonarr_cache.invalidate_series()
+
+        assert [_s["id"] for _s in sonarr_cache.get_series()] == [1]
+        assert sonarr_cache.get_episode_table(1) is _table
+        assert sonarr_cache.get_creator_series("beta") == []
+        assert sonarr_cache.series_version() == _version
+        assert sonarr_cache.episode_versions([1]) == _episode_versions
+
+    assert [_s["id"] for _s in sonarr_cache.get_series()] == [1, 2]
+    assert len(sonarr_cache.get_episode_table(1)) == 2
+    assert sonarr_cache.get_creator_series("beta") == [2]
+    assert sonarr_cache.series_version() != _version
+
+
+def test_batch_shortlists_match_single_query_shortlists():
+    from sonarr_cache import SeriesTitleIndex
+
+    _index = SeriesTitleIndex(
+        [
+            {"id": _id, "title": _title}
+            for _id, _title in enumerate(
+                [
+                    "Alpha Adventures",
+                    "The Alpha Show",
+                    "Beta Cooking",
+                    "Gamma Garage",
+                    "Delta Workshop",
+                    "Epsilon Reviews",
+                    "Zeta Builds",
+                    "Eta Travels",
+                ]
+            )
+        ]
+    )
+    _queries = [
+        "AlphaCreator :: Alpha Adventures Episode 4",
+        "garage guy :: Gamma Garage - engine rebuild",
+        "someone :: completely unrelated",
+    ]
+
+    assert _index.candidates_many(_queries, 3) == [
+        _index.candidates(_query, 3) for _query in _queries
+    ]
+
+
+def test_whole_library_candidates_skip_preprocessing():
+    from sonarr_cache import SeriesTitleIndex
+
+    _index = SeriesTitleIndex([{"id": 1, "title": "Alpha Show"}])
+
+    assert _index.candidates("Alpha :: Pilot", 0) == [("Alpha Show", 1)]
+    assert _index.candidates_many(["Alpha :: Pilot"], 0) == [[("Alpha Show", 1)]]
+    assert "processed" not in vars(_index)
+    assert "tokens" not in vars(_index)
+
+
+def test_creator_map_fetch_is_shared_and_respects_invalidation(sonarr, monkeypatch):
+    import threading
+
+    import sonarr_cache
+
+    _release = threading.Event()
+    _fetch = sonarr.get_tag_detail
+
+    def _slow_tag_detail():
+        _release.wait(5)
+        return _fetch()
+
+    monkeypatch.setattr(sonarr, "get_tag_detail", _slow_tag_detail)
+
+    _results = []
+    _threads = [
+        threading.Thread(
+            target=lambda: _results.append(sonarr_cache.get_creator_series("beta"))
+        )
+        for _ in range(4)
+    ]
+    for _thread in _threads:
+        _thread.start()
+    time.sleep(0.1)
+
+    # Sonarr gains a tag while that fetch is still running.
+    sonarr.tags.append({"label": "wai-beta", "seriesIds": [2]})
+    sonarr_cache.invalidate_tags()
+    _release.set()
+    for _thread in _threads:
+        _thread.join()
+
+    assert sonarr.requests == 1
+    assert len(_results) == 4
+    assert sonarr_cache.creator_series is None
+    assert sonarr_cache.get_creator_series("beta") == [2]
@@ -0,0 +1,139 @@
+# test_sonarr_webhook.py
+
+import pytest
+
+CALENDAR_TIMESTAMP = 1704067200  # 2024-01-01T00:00:00Z
+
+
+@pytest.fixture
+def client(sonarr):
+    from fastapi.testclient import TestClient
+    from server import fastapi
+
+    sonarr.series.append({"id": 2, "title": "Beta Show"})
+    sonarr.episodes[2] = []
+
+    return TestClient(fastapi)
+
+
+@pytest.fixture
+def warm(sonarr):
+    """Fill the cache with every kind of entry a webhook can invalidate."""
+    import sonarr_cache
+
+    def _warm() -> set:
+        sonarr_cache.get_series()
+        sonarr_cache.get_creator_series("alpha")
+        sonarr_cache.get_episode_table(1)
+        sonarr_cache.get_episode_table(2)
+        sonarr_cache.get_calendar_tables(CALENDAR_TIMESTAMP)
+        return cached_keys()
+
+    return _warm
+
+
+def cached_keys() -> set:
+    import sonarr_cache
+
+    _keys = {_key[0] if _key[0] != "episodes" else _key for _key in cache_entries()}
+    if sonarr_cache.creator_series is not None:
+        _keys.add("tags")
+    return _keys
+
+
+def cache_entries() -> list:
+    import sonarr_cache
+
+    return list(sonarr_cache.sonarr_cache._entries)
+
+
+ALL = {"series", "tags", "calendar", ("episodes", 1), ("episodes", 2)}
+
+
+@pytest.mark.parametrize("event", ["SeriesAdd", "SeriesDelete"])
+def test_series_add_and_delete_drop_series_list_tags_and_that_series(
+    client, warm, event
+):
+    assert warm() == ALL
+
+    _response = client.post(
+        "/api/sonarr_webhook", json={"eventType": event, "series": {"id": 1}}
+    )
+
+    assert _response.status_code == 200
+    assert _response.json()["series_id"] == 1
+    assert cached_keys() == {("episodes", 2)}
+
+
+@pytest.mark.parametrize("event", ["Rename", "SeriesUpdate"])
+def test_series_update_drops_only_that_series_episodes(client, warm, event):
+    assert warm() == ALL
+
+    _response = client.post(
+        "/api/sonarr_webhook", json={"eventType": event, "series": {"id": 1}}
+    )
+
+    assert _response.status_code == 200
+    assert cached_keys() == {"series", "tags", ("episodes", 2)}
+
+
+@pytest.mark.parametrize("event", ["Download", "EpisodeFileDelete"])
+def test_episode_file_events_drop_that_series_episodes(client, warm, event):
+    assert warm() == ALL
+
+    _response = client.post(
+        "/api/sonarr_webhook",
+        json={
+            "eventType": event,
+            "series": {"id": 2, "title": "Beta Show"},
+            "episodes": [{"id": 21}],
+            "episodeFile": {"id": 5},
+        },
+    )
+
+    assert _response.status_code == 200
+    assert _response.json()["invalidated"] == 2
+    assert cached_keys() == {"series", "tags", ("episodes", 1)}
+
+
+def test_test_event_invalidates_nothing(client, warm):
+    assert warm() == ALL
+
+    _response = client.post("/api/sonarr_webhook", json={"eventType": "Test"})
+
+    assert _response.status_code == 200
+    assert cached_keys() == ALL
+
+
+def test_unknown_event_without_series_drops_everything(client, warm):
+    assert warm() == ALL
+
+    _response = client.post(
+        "/api/sonarr_webhook", json={"eventType": "SomethingNew"}
+    )
+
+    assert _response.status_code == 200
+    assert cached_keys() == set()
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        b"not json",
+        b"[1, 2, 3]",
+        b"{}",
+        b'{"eventType": ""}',
+        b'{"eventType": ["Download"], "series": "one"}',
+        b'{"eventType": 7, "series": {"id": "1"}}',
+    ],
+)
+def test_malformed_payloads_are_acknowledged(client, warm, body):
+    warm()
+
+    _response = client.post(
+        "/api/sonarr_webhook",
+        content=body,
+        headers={"Content-Type": "application/json"},
+    )
+
+    assert 200 <= _response.status_code < 300
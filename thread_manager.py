@@ -5,8 +5,12 @@ import fauxlogger as _log
 from aging_queue_manager import process_queue as process_aging_queue
 from config import Config
 from decision_queue_manager import process_queue as process_decision_queue
+from history_store import close_history
 from download_queue_manager import process_queue as process_download_queue
 from manual_intervention_manager import mi_thread_worker as run_mi_thread
+from postprocess_queue_manager import process_queue as process_postprocess_queue
+from queue_store import close_store
+from refresh_scheduler import process_refreshes
 from schema import WAIConfigRoot
 from telegram_bot import telegram_bot_thread as run_telegram_thread
 
@@ -16,9 +20,11 @@ config: Config[WAIConfigRoot] = Config(
 )
 
 stop_event = threading.Event()
-decision_queue_thread = threading.Thread()
-download_queue_thread = threading.Thread()
+decision_queue_threads: list[threading.Thread] = []
+download_queue_threads: list[threading.Thread] = []
+postprocess_queue_threads: list[threading.Thread] = []
 aging_queue_thread = threading.Thread()
+refresh_thread = threading.Thread()
 mi_thread = threading.Thread()
 telegram_thread = threading.Thread()
 
@@ -29,37 +35,66 @@ def handle_exit_signal(signum, frame):
 
 
 def start_decision_queue_manager():
-    global decision_queue_thread
-
-    if not decision_queue_thread.ident or not decision_queue_thread.native_id:
-        decision_queue_thread = threading.Thread(
-            target=process_decision_queue,
-            args=(stop_event,),
-            daemon=True,
-            name="decision_queue",
-        )
-        decision_queue_thread.start()
+    global decision_queue_threads
+
+    if not decision_queue_threads:
+        decision_queue_threads = [
+            threading.Thread(
+                target=process_decision_queue,
+                args=(stop_event, _idx),
+                daemon=True,
+                name=f"decision_queue_{_idx}",
+            )
+            for _idx in range(max(1, config.data.decision_queue.matcher_threads))
+        ]
+        for _thread in decision_queue_threads:
+            _thread.start()
 
     return
 
 
 def start_download_queue_manager():
-    global download_queue_thread
+    global download_queue_threads
+
+    if not download_queue_threads:
+        download_queue_threads = [
+            threading.Thread(
+                target=process_download_queue,
+                args=(stop_event, _idx),
+                daemon=True,
+                name=f"download_queue_{_idx}",
+            )
+            for _idx in range(max(1, config.data.download_queue.download_threads))
+        ]
+        for _thread in download_queue_threads:
+            _thread.start()
+
+    return
 
-    if not download_queue_thread.ident or not download_queue_thread.native_id:
-        download_queue_thread = threading.Thread(
-            target=process_download_queue,
-            args=(stop_event,),
-            daemon=True,
-            name="download_queue",
-        )
-        download_queue_thread.start()
+
+def start_postprocess_queue_manager():
+    global postprocess_queue_threads
+
+    if not postprocess_queue_threads:
+        postprocess_queue_threads = [
+            threading.Thread(
+                target=process_postprocess_queue,
+                args=(stop_event, _idx),
+                daemon=True,
+                name=f"postprocess_queue_{_idx}",
+            )
+            for _idx in range(
+                max(1, config.data.postprocess_queue.postprocess_threads)
+            )
+        ]
+        for _thread in postprocess_queue_threads:
+            _thread.start()
 
     return
 
 
 def start_aging_queue_manager():
-    global aging_queue_thread
+    global aging_queue_thread, refresh_thread
 
     if not aging_queue_thread.ident or not aging_queue_thread.native_id:
         aging_queue_thread = threading.Thread(
@@ -70,6 +105,15 @@ def start_aging_queue_manager():
         )
         aging_queue_thread.start()
 
+    if not refresh_thread.ident or not refresh_thread.native_id:
+        refresh_thread = threading.Thread(
+            target=process_refreshes,
+            args=(stop_event,),
+            daemon=True,
+            name="refresh_scheduler",
+        )
+        refresh_thread.start()
+
     return
 
 
@@ -107,24 +151,36 @@ def start_telegram_bot():
 
 
 def stop_decision_queue_manager():
-    global decision_queue_thread
+    global decision_queue_threads
 
-    decision_queue_thread.join()
-    decision_queue_thread = threading.Thread()
+    for _thread in decision_queue_threads:
+        _thread.join()
+    decision_queue_threads = []
 
 
 def stop_aging_queue_manager():
-    global aging_queue_thread
+    global aging_queue_thread, refresh_thread
 
     aging_queue_thread.join()
     aging_queue_thread = threading.Thread()
+    refresh_thread.join()
+    refresh_thread = threading.Thread()
 
 
 def stop_download_queue_manager():
-    global download_queue_thread
+    global download_queue_threads
+
+    for _thread in download_queue_threads:
+        _thread.join()
+    download_queue_threads = []
+
+
+def stop_postprocess_queue_manager():
+    global postprocess_queue_threads
 
-    download_queue_thread.join()
-    download_queue_thread = threading.Thread()
+    for _thread in postprocess_queue_threads:
+        _thread.join()
+    postprocess_queue_threads = []
 
 
 def stop_telegram_bot():
@@ -155,6 +211,9 @@ def startup():
     if config.data.download_queue.run:
         _log.msg("Starting Download Queue Manager")
         start_download_queue_manager()
+    if config.data.postprocess_queue.run:
+        _log.msg("Starting Post-processing Queue Manager")
+        start_postprocess_queue_manager()
     if config.data.manual_intervention.run:
         _log.msg("Starting Manual Intervention Thread")
         start_mi_thread()
@@ -171,5 +230,8 @@ def shutdown():
     stop_decision_queue_manager()
     stop_aging_queue_manager()
     stop_download_queue_manager()
+    stop_postprocess_queue_manager()
     stop_mi_thread()
     stop_telegram_bot()
+    close_store()
+    close_history()
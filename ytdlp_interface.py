@@ -1,4 +1,5 @@
 import os
+import threading
 import time
 
 import fauxlogger as _log
@@ -94,22 +95,18 @@ def cli_to_api(opts: list, cli_defaults: bool = False) -> dict:
     return diff
 
 
-# Anti-stall vars
-dl_last_bytes = 0
-dl_last_change = time.time()
+# Anti-stall vars, per download thread
+dl_stall_state = threading.local()
 
 
 def anti_stall(info):
-
-    global dl_last_bytes, dl_last_change
-
     if info["status"] == "downloading":
         downloaded = info.get("downloaded_bytes", 0)
 
-        if downloaded != dl_last_bytes:
-            dl_last_bytes = downloaded
-            dl_last_change = time.time()
-        elif time.time() - dl_last_change > 20:
+        if downloaded != getattr(dl_stall_state, "last_bytes", 0):
+            dl_stall_state.last_bytes = downloaded
+            dl_stall_state.last_change = time.time()
+        elif time.time() - getattr(dl_stall_state, "last_change", time.time()) > 20:
             raise DownloadError("Anti-Stall: No progress detected")
 
 
@@ -121,6 +118,9 @@ def download_video(video_url: str, target_folder: str) -> str | None:
 
     ensure_dir(target_folder)
 
+    dl_stall_state.last_bytes = 0
+    dl_stall_state.last_change = time.time()
+
     ydl_opts = {
         "logger": YTDLQuietLogger(),
         "subtitleslangs": ["en", "-live_chat"],